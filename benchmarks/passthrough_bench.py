@@ -0,0 +1,85 @@
+"""
+Benchmark the parsed list path against raw PostgREST passthrough.
+
+Compares, per row of a list page:
+  parsed      - response.json(), FastAPI response_model validation, JSON encoding
+  passthrough - counting rows and reading the last ID from the raw bytes
+
+Run from the repository root:
+    python -m benchmarks.passthrough_bench --rows 1000 --repeat 50
+"""
+import argparse
+import json
+import os
+import time
+from typing import List
+
+# Models import settings, which require these to be set
+for name in ("JWT_SECRET", "SPOTIFY_CLIENT_ID", "SPOTIFY_CLIENT_SECRET", "SUPABASE_URL", "SUPABASE_KEY"):
+    os.environ.setdefault(name, "benchmark")
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from models import SongResponse
+from services.passthrough import page_info, passthrough_select
+
+
+def make_body(rows: int) -> bytes:
+    """A PostgREST-shaped JSON array of song rows, columns in passthrough order."""
+    columns = passthrough_select(SongResponse).split(",")
+    sample = {
+        "id": 0,
+        "title": "夜に駆ける",
+        "artist": "YOASOBI",
+        "album": "THE BOOK",
+        "album_image_url": "https://i.scdn.co/image/ab67616d0000b273c5716278abba6a103ad13aa7",
+        "duration": 261346,
+        "spotify_id": "3dPQuX8Gs42Y7b454ybpMR",
+        "created_at": "2024-01-01T00:00:00+00:00",
+    }
+    page = [{column: (i + 1 if column == "id" else sample[column]) for column in columns} for i in range(rows)]
+    return json.dumps(page, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def parsed_path(body: bytes, adapter: TypeAdapter) -> bytes:
+    rows = json.loads(body)
+    # What FastAPI does with a response_model: validate, serialize, encode
+    validated = adapter.validate_python(rows)
+    content = jsonable_encoder(adapter.dump_python(validated, mode="json"))
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def passthrough_path(body: bytes) -> bytes:
+    page_info(body)
+    return body
+
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000, help="rows per page")
+    parser.add_argument("--repeat", type=int, default=50, help="timed runs per path (best is reported)")
+    args = parser.parse_args(argv)
+
+    body = make_body(args.rows)
+    adapter = TypeAdapter(List[SongResponse])
+    parsed = timed(lambda: parsed_path(body, adapter), args.repeat)
+    passthrough = timed(lambda: passthrough_path(body), args.repeat)
+
+    print(f"page: {args.rows} rows, {len(body)} bytes")
+    for name, seconds in (("parsed", parsed), ("passthrough", passthrough)):
+        print(f"{name:>12}: {seconds * 1000:8.3f} ms/page  {seconds / args.rows * 1e6:8.3f} us/row")
+    print(f"{'saved':>12}: {(parsed - passthrough) / args.rows * 1e6:8.3f} us/row ({parsed / passthrough:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
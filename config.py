@@ -3,7 +3,7 @@ Application configuration settings.
 """
 import os
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Dict, List, Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -22,13 +22,125 @@ class Settings(BaseSettings):
     jwt_secret: str
     jwt_algorithm: str = "HS256"
     jwt_expiration_hours: int = 24
+    jwt_verified_cache_max_entries: int = 10_000
+    # Users allowed to run maintenance endpoints such as the progress stats rebuild, e.g. [1, 2]
+    admin_user_ids: List[int] = []
+    # bcrypt runs on a dedicated pool; requests beyond workers + queue get a 503
+    password_hash_workers: int = 4
+    password_hash_max_queue: int = 64
     
     # External APIs
     spotify_client_id: str
     spotify_client_secret: str
     supabase_url: str
     supabase_key: str
-    
+    spotify_token_refresh_margin_seconds: float = 60.0
+    # Spotify search strategy execution: "sequential", "hedged" or "concurrent"
+    spotify_search_mode: Literal["sequential", "hedged", "concurrent"] = "hedged"
+    spotify_search_hedge_delay_ms: int = 150
+    spotify_search_max_concurrency: int = 2
+
+    # LRCLIB search cache (lyrics_cache_path enables the on-disk SQLite tier)
+    lyrics_cache_max_entries: int = 2048
+    lyrics_cache_ttl_seconds: float = 6 * 60 * 60
+    lyrics_cache_stale_seconds: float = 24 * 60 * 60
+    lyrics_cache_path: Optional[str] = None
+    lyrics_cache_disk_max_entries: int = 100_000
+    lyrics_cache_prune_interval_seconds: float = 60 * 60
+
+    # Read-through cache of single rows in SupabaseService, with a TTL per cached table
+    entity_cache_enabled: bool = True
+    entity_cache_max_entries: int = 50_000
+    entity_cache_max_bytes: int = 64 * 1024 * 1024
+    entity_cache_ttl_seconds: Dict[str, float] = {
+        "songs": 600.0,
+        "lyrics": 600.0,
+        "matched": 300.0,
+        "users": 60.0,
+        # Looked up on every session event post to check the session exists
+        "practice_sessions": 300.0,
+    }
+
+    # Per-lyrics playback-position indexes over lyric line timings
+    lyric_timing_cache_max_entries: int = 4096
+    lyric_timing_cache_ttl_seconds: float = 3600.0
+
+    # Practice progress events are buffered and written in bulk on size/time thresholds
+    progress_flush_max_events: int = 500
+    progress_flush_interval_ms: int = 250
+    progress_max_buffered_events: int = 50_000
+    # Running accuracy counters kept in memory; evicted ones are recomputed from raw rows when read
+    progress_stats_max_counters: int = 100_000
+    progress_stats_ttl_seconds: float = 60 * 60
+
+    # In-memory n-gram index for matched-song title/artist search
+    song_search_index_enabled: bool = True
+
+    # In-memory bigram index for full-text search over lyric lines
+    lyric_search_index_enabled: bool = True
+    # Ranked hits kept per normalized query so later pages are slices; cleared on line writes
+    lyric_search_max_hits: int = 1000
+    lyric_search_cache_max_entries: int = 256
+    lyric_search_cache_ttl_seconds: float = 300.0
+
+    # ETag validators for conditional GETs of lyrics, songs and matched songs
+    etag_validator_cache_max_entries: int = 20_000
+    etag_validator_ttl_seconds: float = 300.0
+    http_cache_control: str = "public, max-age=60, s-maxage=300"
+
+    # Pre-serialized, pre-compressed response bodies for lyrics with lines
+    response_cache_max_bytes: int = 64 * 1024 * 1024
+    response_cache_max_entries: int = 10_000
+    response_cache_ttl_seconds: float = 300.0
+    response_cache_min_compress_bytes: int = 1024
+    response_cache_brotli_quality: int = 5
+
+    # Return PostgREST list pages unparsed when the response model is flat
+    list_passthrough_enabled: bool = True
+
+    # Identical concurrent Supabase GETs share one upstream call
+    supabase_coalesce_reads: bool = True
+
+    # Supabase tail latency: adaptive timeouts, hedged GETs, jittered retries, circuit breaker
+    supabase_latency_window: int = 1000
+    supabase_min_latency_samples: int = 50
+    supabase_timeout_percentile: float = 99.0
+    supabase_timeout_multiplier: float = 3.0
+    supabase_min_timeout_seconds: float = 1.0
+    supabase_hedge_enabled: bool = True
+    supabase_hedge_percentile: float = 95.0
+    supabase_hedge_min_delay_ms: float = 10.0
+    supabase_hedge_max_ratio: float = 0.1
+    supabase_max_retries: int = 2
+    supabase_retry_base_delay_ms: float = 50.0
+    supabase_retry_max_delay_ms: float = 1000.0
+    supabase_breaker_failure_threshold: int = 5
+    supabase_breaker_reset_seconds: float = 10.0
+
+    # Per-request deadline (X-Request-Timeout-Ms header, else the longest matching route
+    # prefix, else the default); 0 disables it. Only the time to the first response byte counts.
+    request_deadline_default_ms: int = 15_000
+    request_deadline_max_ms: int = 60_000
+    request_deadline_route_ms: Dict[str, int] = {
+        "/songs/": 10_000,
+        "/api/matched": 5_000,
+        "/api/library": 5_000,
+        "/api/progress/stats/rebuild": 0,
+    }
+
+    # Prometheus metrics on /metrics
+    metrics_enabled: bool = True
+    metrics_loop_lag_interval_ms: int = 500
+
+    # Outbound HTTP connection pool (shared by Supabase, LRCLIB and Spotify calls)
+    http2_enabled: bool = True
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry_seconds: float = 30.0
+    http_timeout_seconds: float = 10.0
+    http_connect_timeout_seconds: float = 5.0
+    http_pool_timeout_seconds: float = 5.0
+
     # Application
     app_name: str = "Ekubo API"
     debug: bool = False
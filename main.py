@@ -1,21 +1,75 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import songs, auth, songs_new, lyrics, matched, user_library
+from config import settings
+from routers import songs, auth, songs_new, lyrics, matched, user_library, user_progress, stats, metrics
+from services.deadline import DeadlineMiddleware
+from services.http_client import http_client
+from services.lyric_search import lyric_search_index
+from services.metrics import MetricsMiddleware, loop_lag_monitor
+from services.pagination import NEXT_CURSOR_HEADER
+from services.password_service import password_hasher
+from services.progress_buffer import progress_buffer
+from services.song_search import song_search_index
+from services.song_service import lyrics_disk_cache
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared resources on startup and release them on shutdown."""
+    await http_client.start()
+    progress_buffer.start()
+    if lyrics_disk_cache is not None:
+        # Entries past TTL + stale window are never served again
+        lyrics_disk_cache.start_pruning(
+            settings.lyrics_cache_ttl_seconds + settings.lyrics_cache_stale_seconds,
+            settings.lyrics_cache_prune_interval_seconds
+        )
+    if settings.metrics_enabled:
+        loop_lag_monitor.start()
+    if settings.song_search_index_enabled:
+        song_search_index.start()
+    if settings.lyric_search_index_enabled:
+        lyric_search_index.start()
+    try:
+        yield
+    finally:
+        await loop_lag_monitor.stop()
+        await song_search_index.stop()
+        await lyric_search_index.stop()
+        # Write buffered progress before the HTTP client goes away
+        await progress_buffer.stop()
+        await http_client.close()
+        password_hasher.shutdown()
+        if lyrics_disk_cache is not None:
+            await lyrics_disk_cache.stop_pruning()
+            lyrics_disk_cache.close()
+
 
 app = FastAPI(
     title="Ekubo API",
     description="Japanese listening practice API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Added before CORS so deadline 504s still get CORS headers
+app.add_middleware(DeadlineMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
+# Outermost, so timings include CORS handling and deadline 504s
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
 # Legacy routes (for backward compatibility)
 app.include_router(songs.router, prefix="/songs", tags=["Songs (Legacy)"])
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
@@ -25,3 +79,9 @@ app.include_router(songs_new.router, prefix="/api/songs", tags=["Songs"])
 app.include_router(lyrics.router, prefix="/api/lyrics", tags=["Lyrics"])
 app.include_router(matched.router, prefix="/api/matched", tags=["Matched Songs"])
 app.include_router(user_library.router, prefix="/api/library", tags=["User Library"])
+app.include_router(user_progress.router, prefix="/api/progress", tags=["User Progress"])
+
+# Operational endpoints
+app.include_router(stats.router, prefix="/stats", tags=["Stats"])
+if settings.metrics_enabled:
+    app.include_router(metrics.router, tags=["Stats"])
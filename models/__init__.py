@@ -1,10 +1,10 @@
 """
 Pydantic schemas package for API.
 """
-from .song import SongCreate, SongUpdate, SongResponse, SongInDB
-from .lyrics import LyricsCreate, LyricsResponse, LyricsWithLines, LyricLineCreate, LyricLineResponse
+from .song import SongCreate, SongUpdate, SongResponse, SongSummary, SongInDB
+from .lyrics import LyricsCreate, LyricsResponse, LyricsSummary, LyricsWithLines, LyricLineCreate, LyricLineResponse, LyricLinePosition, LyricSearchHit
 from .user import UserCreate, UserUpdate, UserResponse, UserInDB, UserLogin, UserSignup
-from .matched import MatchedCreate, MatchedUpdate, MatchedResponse, MatchedWithDetails, MatchedInDB
+from .matched import MatchedCreate, MatchedUpdate, MatchedResponse, MatchedWithDetails, MatchedSummary, MatchedInDB
 from .user_library import UserLibraryCreate, UserLibraryUpdate, UserLibraryResponse, UserLibraryWithDetails, UserLibraryInDB
 from .user_progress import (
     UserProgressCreate, 
@@ -13,22 +13,26 @@ from .user_progress import (
     UserProgressWithDetails, 
     UserProgressInDB,
     PracticeSessionCreate,
-    PracticeSessionResponse
+    PracticeSessionResponse,
+    ProgressIngestResponse,
+    ProgressStats,
+    ProgressStatsDrift,
+    ProgressStatsRebuildResponse
 )
 
 __all__ = [
     # Song schemas
-    "SongCreate", "SongUpdate", "SongResponse", "SongInDB",
+    "SongCreate", "SongUpdate", "SongResponse", "SongSummary", "SongInDB",
     
     # Lyrics schemas
-    "LyricsCreate", "LyricsResponse", "LyricsWithLines", 
-    "LyricLineCreate", "LyricLineResponse",
+    "LyricsCreate", "LyricsResponse", "LyricsSummary", "LyricsWithLines", 
+    "LyricLineCreate", "LyricLineResponse", "LyricLinePosition", "LyricSearchHit",
     
     # User schemas
     "UserCreate", "UserUpdate", "UserResponse", "UserInDB", "UserLogin", "UserSignup",
     
     # Matched schemas
-    "MatchedCreate", "MatchedUpdate", "MatchedResponse", "MatchedWithDetails", "MatchedInDB",
+    "MatchedCreate", "MatchedUpdate", "MatchedResponse", "MatchedWithDetails", "MatchedSummary", "MatchedInDB",
     
     # User Library schemas
     "UserLibraryCreate", "UserLibraryUpdate", "UserLibraryResponse", "UserLibraryWithDetails", "UserLibraryInDB",
@@ -36,4 +40,5 @@ __all__ = [
     # User Progress schemas
     "UserProgressCreate", "UserProgressUpdate", "UserProgressResponse", 
     "UserProgressWithDetails", "UserProgressInDB", "PracticeSessionCreate", "PracticeSessionResponse",
+    "ProgressIngestResponse", "ProgressStats", "ProgressStatsDrift", "ProgressStatsRebuildResponse",
 ]
@@ -48,6 +48,14 @@ class LyricsResponse(LyricsBase):
     lyric_lines: List[LyricLineResponse] = []
 
 
+class LyricsSummary(BaseModel):
+    """Slim lyrics schema for list views, without the synced_lyrics text."""
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: int
+    created_at: datetime
+
+
 class LyricsInDB(LyricsResponse):
     """Schema for lyrics in database."""
     pass
@@ -56,3 +64,17 @@ class LyricsInDB(LyricsResponse):
 class LyricsWithLines(LyricsResponse):
     """Schema for lyrics with parsed lines."""
     lyric_lines: List[LyricLineResponse] = Field(default_factory=list)
+
+
+class LyricLinePosition(BaseModel):
+    """Schema for the lyric line playing at a playback position."""
+    t_ms: int
+    line: Optional[LyricLineResponse] = None
+
+
+class LyricSearchHit(BaseModel):
+    """Schema for a lyric line matching a full-text search."""
+    lyrics_id: int
+    line_id: int
+    start_time_ms: Optional[int] = None
+    score: float
@@ -41,15 +41,22 @@ class MatchedWithDetails(MatchedResponse):
     created_by_user: Optional["UserResponse"] = None
 
 
+class MatchedSummary(MatchedResponse):
+    """Schema for matched song-lyrics list views with slim song and lyrics details."""
+    song: Optional["SongSummary"] = None
+    lyrics: Optional["LyricsSummary"] = None
+
+
 class MatchedInDB(MatchedResponse):
     """Schema for matched song-lyrics in database."""
     pass
 
 
 # Import here to avoid circular imports
-from models.song import SongResponse
-from models.lyrics import LyricsResponse
+from models.song import SongResponse, SongSummary
+from models.lyrics import LyricsResponse, LyricsSummary
 from models.user import UserResponse
 
 # Update forward references
 MatchedWithDetails.model_rebuild()
+MatchedSummary.model_rebuild()
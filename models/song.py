@@ -36,6 +36,16 @@ class SongResponse(SongBase):
     created_at: datetime
 
 
+class SongSummary(BaseModel):
+    """Slim song schema for list views."""
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: int
+    title: Optional[str] = None
+    artist: Optional[str] = None
+    album_image_url: Optional[str] = None
+
+
 class SongInDB(SongResponse):
     """Schema for song in database."""
     pass
\ No newline at end of file
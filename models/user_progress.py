@@ -69,4 +69,33 @@ class PracticeSessionResponse(BaseModel):
     ended_at: Optional[datetime] = None
     total_lines: Optional[int] = None
     correct_lines: Optional[int] = None
-    accuracy_percentage: Optional[float] = None
\ No newline at end of file
+    accuracy_percentage: Optional[float] = None
+
+
+class ProgressIngestResponse(BaseModel):
+    """Schema for acknowledging ingested progress events."""
+    accepted: int
+    durable: bool
+
+
+class ProgressStats(BaseModel):
+    """Schema for running practice accuracy counters."""
+    total_lines: int
+    correct_lines: int
+    accuracy_percentage: float
+
+
+class ProgressStatsDrift(BaseModel):
+    """Schema for a counter that differed from its recomputed value."""
+    scope: str
+    key: str
+    expected: ProgressStats
+    actual: ProgressStats
+
+
+class ProgressStatsRebuildResponse(BaseModel):
+    """Schema for the result of recomputing the counters from raw progress rows."""
+    rows_scanned: int
+    counters: int
+    drift_count: int
+    drift: List[ProgressStatsDrift]
@@ -1,54 +1,22 @@
-import os
+from typing import Any, Dict
 
-import bcrypt
-import jwt
-from fastapi import APIRouter, HTTPException
-from httpx import AsyncClient
+from fastapi import APIRouter, Depends, HTTPException
 
 from models.auth import LoginRequest, SignupRequest
+from services.auth_service import get_current_user, token_verifier
+from services.password_service import password_hasher
+from services.supabase_service import supabase_service
 
 router = APIRouter()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-JWT_SECRET = os.getenv("JWT_SECRET")
-
 
 async def get_user_by_email(email: str):
-    async with AsyncClient() as client:
-        response = await client.get(
-            f"{SUPABASE_URL}/rest/v1/users",
-            params={"select": "*", "email": f"eq.{email}"},
-            headers={
-                "apikey": SUPABASE_KEY,
-                "Authorization": f"Bearer {SUPABASE_KEY}",
-                "Accept": "application/json",
-            },
-        )
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=500, detail="Error fetching user from database."
-            )
-        users = response.json()
-        return users[0] if users and len(users) else None
+    users = await supabase_service.search("users", {"email": email}, limit=1)
+    return users[0] if users else None
 
 
 async def create_user(email: str, username: str, hashed_password: str):
-    async with AsyncClient() as client:
-        response = await client.post(
-            f"{SUPABASE_URL}/rest/v1/users",
-            headers={
-                "apikey": SUPABASE_KEY,
-                "Authorization": f"Bearer {SUPABASE_KEY}",
-                "Content-Type": "application/json",
-                "Prefer": "return=representation",
-            },
-            json={"email": email, "username": username, "password": hashed_password},
-        )
-        if response.status_code not in [201, 200]:
-            raise HTTPException(
-                status_code=500, detail="Error creating user in database."
-            )
+    await supabase_service.create("users", {"email": email, "username": username, "password": hashed_password})
 
 
 @router.post("/signup")
@@ -56,17 +24,22 @@ async def signup(request: SignupRequest):
     existing_user = await get_user_by_email(request.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already exists.")
-    hashed_password = bcrypt.hashpw(request.password.encode("utf-8"), bcrypt.gensalt())
-    await create_user(request.email, request.username, hashed_password.decode("utf-8"))
+    hashed_password = await password_hasher.hash_password(request.password)
+    await create_user(request.email, request.username, hashed_password)
     return {"message": "User created successfully."}
 
 
 @router.post("/login")
 async def login(request: LoginRequest):
     user = await get_user_by_email(request.email)
-    print('USER ---------------------------------->', user)
-    if not user or not bcrypt.checkpw(request.password.encode("utf-8"), user["password"].encode("utf-8")):
+    if not user or not await password_hasher.verify_password(request.password, user["password"]):
         raise HTTPException(status_code=400, detail="Invalid email or password.")
-    token = jwt.encode({"email": user["email"], "username": user["username"], "id": user["id"]}, JWT_SECRET, algorithm="HS256")
+    token = token_verifier.create_token(user)
     return {"token": token}
 
+
+@router.get("/me")
+async def get_me(current_user: Dict[str, Any] = Depends(get_current_user)):
+    """Get the authenticated user from the bearer token, without a database lookup."""
+    return {key: current_user.get(key) for key in ("id", "email", "username", "created_at")}
+
@@ -1,96 +1,229 @@
 """
 Lyrics router for managing lyrics and lyric lines.
 """
-from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Query
+import asyncio
+import json
+from typing import List, Literal, Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from pydantic import TypeAdapter
 
-from models import LyricsCreate, LyricsResponse, LyricsWithLines, LyricLineCreate, LyricLineResponse
+from models import (
+    LyricsCreate,
+    LyricsResponse,
+    LyricsSummary,
+    LyricsWithLines,
+    LyricLineCreate,
+    LyricLineResponse,
+    LyricLinePosition,
+    LyricSearchHit
+)
+from services.conditional import cached_not_modified, etag_response, response_validators
+from services.lrc_parser import parse_lrc
+from services.lyric_search import lyric_search_index
+from services.lyric_timing import lyric_timing_indexes
+from services.pagination import cursor_after_id, cursor_offset, set_next_cursor, set_next_offset_cursor
+from services.passthrough import list_select, passthrough_page, projection_select
+from services.response_cache import response_cache
+from services.streaming import ndjson_response, wants_ndjson
 from services.supabase_service import supabase_service
 
 router = APIRouter()
 
+LyricLineList = TypeAdapter(List[LyricLineResponse])
+
 
 @router.get("/", response_model=List[LyricsResponse])
 async def get_lyrics(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0, description="Number of lyrics to skip"),
     limit: int = Query(100, ge=1, le=1000, description="Number of lyrics to return"),
-    synced_lyrics: Optional[str] = Query(None, description="Filter by synced lyrics content")
+    cursor: Optional[str] = Query(None, description="Cursor from X-Next-Cursor; takes precedence over skip"),
+    synced_lyrics: Optional[str] = Query(None, description="Filter by synced lyrics content"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return (e.g. created_at); id is always included"),
+    view: Literal["full", "summary"] = Query("full", description="summary returns LyricsSummary rows without synced_lyrics; ignored when fields is set"),
+    stream: bool = Query(False, description="Stream rows as NDJSON (same as Accept: application/x-ndjson)")
 ):
-    """Get all lyrics with pagination and optional filters."""
+    """Get all lyrics with pagination, optional filters and column projection."""
+    after_id = cursor_after_id(cursor)
+    select = list_select(LyricsResponse, fields, LyricsSummary, view)
     try:
         filters = {}
         if synced_lyrics:
             filters["synced_lyrics"] = synced_lyrics
         
+        if wants_ndjson(request, stream):
+            return await ndjson_response(
+                supabase_service.stream_multi(
+                    "lyrics", skip=skip, limit=limit, filters=filters, after_id=after_id, select=select
+                ),
+                None if select else LyricsResponse
+            )
+        
+        if select:
+            return await passthrough_page(
+                "lyrics", select, skip=skip, limit=limit, filters=filters, after_id=after_id
+            )
+        
         if filters:
-            lyrics = await supabase_service.search("lyrics", filters, skip=skip, limit=limit)
+            lyrics = await supabase_service.search("lyrics", filters, skip=skip, limit=limit, after_id=after_id)
         else:
-            lyrics = await supabase_service.get_multi("lyrics", skip=skip, limit=limit)
+            lyrics = await supabase_service.get_multi("lyrics", skip=skip, limit=limit, after_id=after_id)
+        set_next_cursor(response, lyrics, limit)
         return lyrics
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch lyrics: {str(e)}")
 
 
-@router.get("/{lyrics_id}", response_model=LyricsWithLines)
-async def get_lyrics_with_lines(lyrics_id: int):
-    """Get lyrics with all associated lines."""
+@router.get("/search", response_model=List[LyricSearchHit])
+async def search_lyric_lines(
+    response: Response,
+    q: str = Query(..., min_length=2, description="Phrase to find in lyric lines (kana and width insensitive)"),
+    limit: int = Query(50, ge=1, le=500, description="Number of hits to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from X-Next-Cursor")
+):
+    """Find lyric lines containing a phrase, best matches first."""
+    offset = cursor_offset(cursor)
     try:
-        lyrics = await supabase_service.get("lyrics", lyrics_id)
-        if not lyrics:
-            raise HTTPException(status_code=404, detail="Lyrics not found")
+        if lyric_search_index.ready:
+            # One extra hit tells whether another page follows
+            hits = lyric_search_index.search(q, offset, limit + 1)
+            set_next_offset_cursor(response, offset + limit, len(hits) > limit)
+            return hits[:limit]
         
-        # Get lyric lines
-        lyric_lines = await supabase_service._make_request(
-            "GET", 
-            f"lyric_lines?lyrics_id=eq.{lyrics_id}",
-            params={"order": "id"}
+        # Index still loading: unranked, exact-substring search upstream
+        lines = await supabase_service.search_with_pattern("lyric_lines", "text_content", q, offset, limit)
+        set_next_offset_cursor(response, offset + limit, len(lines) >= limit)
+        return [
+            {"lyrics_id": line["lyrics_id"], "line_id": line["id"], "start_time_ms": line.get("start_time_ms"), "score": 0.0}
+            for line in lines
+        ]
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to search lyric lines: {str(e)}")
+
+
+async def _fetch_lyric_lines(lyrics_id: int, select: Optional[str] = None) -> List[dict]:
+    params = {"lyrics_id": f"eq.{lyrics_id}", "order": "id"}
+    if select:
+        params["select"] = select
+    return await supabase_service._make_request("GET", "lyric_lines", params=params) or []
+
+
+@router.get("/{lyrics_id}", response_model=LyricsWithLines)
+async def get_lyrics_with_lines(lyrics_id: int, request: Request):
+    """Get lyrics with all associated lines. Supports If-None-Match and gzip/brotli encoding."""
+    key = ("lyrics_with_lines", lyrics_id)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached.respond(request)
+    not_modified = cached_not_modified(request, key)
+    if not_modified is not None:
+        return not_modified
+    
+    since = response_validators.mark()
+    try:
+        lyrics, lyric_lines = await asyncio.gather(
+            supabase_service.get("lyrics", lyrics_id),
+            _fetch_lyric_lines(lyrics_id)
         )
-        lyrics["lyric_lines"] = lyric_lines
-        
-        return lyrics
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch lyrics: {str(e)}")
+    
+    if not lyrics:
+        raise HTTPException(status_code=404, detail="Lyrics not found")
+    lyrics["lyric_lines"] = lyric_lines
+    body = LyricsWithLines.model_validate(lyrics).model_dump_json().encode()
+    cached = await response_cache.put(key, body, tags=[f"lyrics:{lyrics_id}"], since=since)
+    return cached.respond(request)
+
+
+def _lyrics_changed(lyrics_id: int):
+    """Drop derived state built from a lyrics record or its lines."""
+    lyric_timing_indexes.invalidate(lyrics_id)
+    response_validators.invalidate_tag(f"lyrics:{lyrics_id}")
+    response_cache.invalidate_tag(f"lyrics:{lyrics_id}")
+
+
+async def _insert_lyric_lines(lines: List[LyricLineCreate]) -> List[dict]:
+    """Insert lyric lines with bulk array inserts."""
+    try:
+        created = await supabase_service.create_many("lyric_lines", [line.model_dump() for line in lines])
+        lyric_search_index.upsert_lines(created)
+        return created
+    finally:
+        for lyrics_id in {line.lyrics_id for line in lines}:
+            _lyrics_changed(lyrics_id)
 
 
 @router.post("/", response_model=LyricsResponse)
-async def create_lyrics(lyrics_data: LyricsCreate):
-    """Create new lyrics."""
+async def create_lyrics(
+    lyrics_data: LyricsCreate,
+    parse_lines: bool = Query(True, description="Parse synced_lyrics (LRC) into lyric lines")
+):
+    """Create new lyrics, storing their parsed LRC lines in one bulk insert."""
     try:
         lyrics = await supabase_service.create("lyrics", lyrics_data.model_dump())
+        if parse_lines and lyrics:
+            lines = parse_lrc(lyrics_data.synced_lyrics, lyrics["id"])
+            lyrics["lyric_lines"] = await _insert_lyric_lines(lines)
         return lyrics
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create lyrics: {str(e)}")
 
 
 @router.put("/{lyrics_id}", response_model=LyricsResponse)
-async def update_lyrics(lyrics_id: int, lyrics_data: LyricsCreate):
-    """Update lyrics."""
-    lyrics = await supabase_service.get("lyrics", lyrics_id)
-    if not lyrics:
-        raise HTTPException(status_code=404, detail="Lyrics not found")
-    
+async def update_lyrics(
+    lyrics_id: int,
+    lyrics_data: LyricsCreate,
+    parse_lines: bool = Query(True, description="Replace lyric lines with ones parsed from synced_lyrics (LRC)")
+):
+    """Update lyrics, replacing their lyric lines with the newly parsed ones."""
     try:
         updated_lyrics = await supabase_service.update("lyrics", lyrics_id, lyrics_data.model_dump())
-        return updated_lyrics
+        if updated_lyrics and parse_lines:
+            old_lines = await supabase_service.get_all("lyric_lines", {"lyrics_id": lyrics_id}, select="id")
+            old_line_ids = [line["id"] for line in old_lines]
+            # The new lines go in first, so a failed insert leaves the old ones in place
+            lines = parse_lrc(lyrics_data.synced_lyrics, lyrics_id)
+            updated_lyrics["lyric_lines"] = await _insert_lyric_lines(lines)
+            await supabase_service.delete_in("lyric_lines", "id", old_line_ids)
+            lyric_search_index.remove_lines(old_line_ids)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update lyrics: {str(e)}")
+    finally:
+        _lyrics_changed(lyrics_id)
+    
+    if not updated_lyrics:
+        raise HTTPException(status_code=404, detail="Lyrics not found")
+    return updated_lyrics
 
 
 @router.delete("/{lyrics_id}")
 async def delete_lyrics(lyrics_id: int):
     """Delete lyrics."""
-    lyrics = await supabase_service.get("lyrics", lyrics_id)
-    if not lyrics:
-        raise HTTPException(status_code=404, detail="Lyrics not found")
-    
     try:
         success = await supabase_service.delete("lyrics", lyrics_id)
-        if success:
-            return {"message": "Lyrics deleted successfully"}
-        else:
-            raise HTTPException(status_code=500, detail="Failed to delete lyrics")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete lyrics: {str(e)}")
+    finally:
+        _lyrics_changed(lyrics_id)
+    
+    if not success:
+        raise HTTPException(status_code=404, detail="Lyrics not found")
+    lyric_search_index.remove_lyrics(lyrics_id)
+    return {"message": "Lyrics deleted successfully"}
 
 
 @router.post("/{lyrics_id}/lines", response_model=LyricLineResponse)
@@ -106,26 +239,102 @@ async def create_lyric_line(lyrics_id: int, line_data: LyricLineCreate):
         line_data_dict = line_data.model_dump()
         line_data_dict["lyrics_id"] = lyrics_id
         lyric_line = await supabase_service.create("lyric_lines", line_data_dict)
+        _lyrics_changed(lyrics_id)
+        lyric_search_index.upsert_lines([lyric_line])
         return lyric_line
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create lyric line: {str(e)}")
 
 
-@router.get("/{lyrics_id}/lines", response_model=List[LyricLineResponse])
-async def get_lyric_lines(lyrics_id: int):
-    """Get all lyric lines for specific lyrics."""
+@router.post("/{lyrics_id}/lines/batch", response_model=List[LyricLineResponse])
+async def create_lyric_lines(lyrics_id: int, lines_data: List[LyricLineCreate]):
+    """Create many lyric lines with a single bulk insert."""
     try:
         # Verify lyrics exist
         lyrics = await supabase_service.get("lyrics", lyrics_id)
         if not lyrics:
             raise HTTPException(status_code=404, detail="Lyrics not found")
         
-        # Get lyric lines
-        lyric_lines = await supabase_service._make_request(
-            "GET", 
-            f"lyric_lines?lyrics_id=eq.{lyrics_id}",
-            params={"order": "id"}
+        for line_data in lines_data:
+            line_data.lyrics_id = lyrics_id
+        return await _insert_lyric_lines(lines_data)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to create lyric lines: {str(e)}")
+
+
+@router.get("/{lyrics_id}/lines", response_model=List[LyricLineResponse])
+async def get_lyric_lines(
+    lyrics_id: int,
+    request: Request,
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return (e.g. start_time_ms,end_time_ms); id is always included")
+):
+    """Get all lyric lines for specific lyrics. Supports If-None-Match."""
+    select = projection_select(fields, LyricLineResponse) if fields else None
+    key = ("lyric_lines", lyrics_id, select)
+    not_modified = cached_not_modified(request, key)
+    if not_modified is not None:
+        return not_modified
+    
+    since = response_validators.mark()
+    try:
+        lyrics, lyric_lines = await asyncio.gather(
+            supabase_service.get("lyrics", lyrics_id),
+            _fetch_lyric_lines(lyrics_id, select)
         )
-        return lyric_lines
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch lyric lines: {str(e)}")
+    
+    # Verify lyrics exist
+    if not lyrics:
+        raise HTTPException(status_code=404, detail="Lyrics not found")
+    if select:
+        body = json.dumps(lyric_lines, ensure_ascii=False, separators=(",", ":")).encode()
+    else:
+        body = LyricLineList.dump_json(LyricLineList.validate_python(lyric_lines))
+    return etag_response(request, key, body, tags=[f"lyrics:{lyrics_id}"], since=since)
+
+
+async def _get_timing_index(lyrics_id: int):
+    index = await lyric_timing_indexes.get(lyrics_id)
+    if not len(index):
+        # No timed lines: distinguish untimed lyrics from missing ones
+        lyrics = await supabase_service.get("lyrics", lyrics_id)
+        if not lyrics:
+            raise HTTPException(status_code=404, detail="Lyrics not found")
+    return index
+
+
+@router.get("/{lyrics_id}/at", response_model=LyricLinePosition)
+async def get_lyric_line_at(
+    lyrics_id: int,
+    t_ms: int = Query(..., ge=0, description="Playback position in milliseconds")
+):
+    """Get the lyric line playing at a playback position."""
+    try:
+        index = await _get_timing_index(lyrics_id)
+        return {"t_ms": t_ms, "line": index.line_at(t_ms)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to look up lyric line: {str(e)}")
+
+
+@router.get("/{lyrics_id}/at/batch", response_model=List[LyricLinePosition])
+async def get_lyric_lines_at(
+    lyrics_id: int,
+    t_ms: List[int] = Query(..., max_length=1000, description="Playback positions in milliseconds")
+):
+    """Get the lyric lines playing at several playback positions."""
+    try:
+        index = await _get_timing_index(lyrics_id)
+        return [{"t_ms": t, "line": index.line_at(t)} for t in t_ms]
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch lyric lines: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to look up lyric lines: {str(e)}")
@@ -1,66 +1,117 @@
 """
 Matched songs router for managing matched song-lyrics pairs.
 """
-from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Query
+from typing import Any, Dict, List, Literal, Optional, Union
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from pydantic import TypeAdapter
 
-from models import MatchedCreate, MatchedResponse, MatchedUpdate, MatchedWithDetails
+from models import (
+    LyricsSummary,
+    MatchedCreate,
+    MatchedResponse,
+    MatchedSummary,
+    MatchedUpdate,
+    MatchedWithDetails,
+    SongSummary
+)
+from services.conditional import JSON_MEDIA_TYPE, cached_not_modified, etag_response, response_validators
+from services.passthrough import passthrough_select
+from services.song_search import song_search_index
 from services.supabase_service import supabase_service
 
 router = APIRouter()
 
+MatchedSummaryList = TypeAdapter(List[MatchedSummary])
 
-@router.get("/", response_model=List[MatchedWithDetails])
+
+@router.get("/", response_model=Union[List[MatchedWithDetails], List[MatchedSummary]])
 async def get_matched_songs(
     q: str | None = Query(
         None,
-        description="Search query for song title (partial match)",
+        description="Search query for song title or artist (partial match)",
     ),
     skip: int = Query(0, ge=0, description="Number of matched songs to skip"),
-    limit: int = Query(100, ge=1, le=1000, description="Number of matched songs to return")
+    limit: int = Query(100, ge=1, le=1000, description="Number of matched songs to return"),
+    view: Literal["full", "summary"] = Query(
+        "full",
+        description="summary embeds SongSummary/LyricsSummary details (no synced_lyrics)"
+    )
 ):
-    """Get all matched songs with pagination and optional title search."""
+    """Get all matched songs with pagination and optional title/artist search."""
+    summary = view == "summary"
+    # Summary views only load the columns their slim models need
+    song_relation = ("songs", "song_id", passthrough_select(SongSummary)) if summary else ("songs", "song_id")
+    lyrics_relation = ("lyrics", "lyrics_id", passthrough_select(LyricsSummary)) if summary else ("lyrics", "lyrics_id")
     try:
         matched_results = []
-        if q:
+        if q and song_search_index.ready:
+            matched_ids = song_search_index.search(q, skip, limit)
+            matches = await supabase_service.get_many("matched", matched_ids)
+            matched_results = [matches[matched_id] for matched_id in matched_ids if matched_id in matches]
+            
+            await supabase_service.attach_related(matched_results, {
+                "song": song_relation,
+                "lyrics": lyrics_relation
+            })
+        elif q:
             songs = await supabase_service.search_with_pattern("songs", "title", q, skip, limit)
+            matches = await supabase_service.search_in("matched", "song_id", (song["id"] for song in songs))
+            
+            matches_by_song: Dict[int, List[Dict[str, Any]]] = {}
+            for match in matches:
+                matches_by_song.setdefault(match["song_id"], []).append(match)
+            
             for song in songs:
-                matches = await supabase_service.search("matched", {"song_id": song["id"]})
-                for match in matches:
+                for match in matches_by_song.get(song["id"], []):
                     match_with_details = match.copy()
                     match_with_details["song"] = song
-                    if match.get("lyrics_id"):
-                        lyrics = await supabase_service.get("lyrics", match["lyrics_id"])
-                        match_with_details["lyrics"] = lyrics
                     matched_results.append(match_with_details)
+            
+            await supabase_service.attach_related(matched_results, {"lyrics": lyrics_relation})
+        
+        if summary:
+            return Response(
+                content=MatchedSummaryList.dump_json(MatchedSummaryList.validate_python(matched_results)),
+                media_type=JSON_MEDIA_TYPE
+            )
         return matched_results
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch matched songs: {str(e)}")
 
 @router.get("/{matched_id}", response_model=MatchedWithDetails)
-async def get_matched_song(matched_id: int):
-    """Get a specific matched song by ID with full details."""
+async def get_matched_song(matched_id: int, request: Request):
+    """Get a specific matched song by ID with full details. Supports If-None-Match."""
+    key = ("matched", matched_id)
+    not_modified = cached_not_modified(request, key)
+    if not_modified is not None:
+        return not_modified
+    
+    since = response_validators.mark()
     try:
         matched_song = await supabase_service.get("matched", matched_id)
-        if not matched_song:
-            raise HTTPException(status_code=404, detail="Matched song not found")
-        
-        # Get related data
-        if matched_song.get("song_id"):
-            song = await supabase_service.get("songs", matched_song["song_id"])
-            matched_song["song"] = song
-        
-        if matched_song.get("lyrics_id"):
-            lyrics = await supabase_service.get("lyrics", matched_song["lyrics_id"])
-            matched_song["lyrics"] = lyrics
-        
-        if matched_song.get("created_by_user_id"):
-            user = await supabase_service.get("users", matched_song["created_by_user_id"])
-            matched_song["created_by_user"] = user
-        
-        return matched_song
+        if matched_song:
+            # Get related data
+            await supabase_service.attach_related([matched_song], {
+                "song": ("songs", "song_id"),
+                "lyrics": ("lyrics", "lyrics_id"),
+                "created_by_user": ("users", "created_by_user_id")
+            })
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch matched song: {str(e)}")
+    
+    if not matched_song:
+        raise HTTPException(status_code=404, detail="Matched song not found")
+    body = MatchedWithDetails.model_validate(matched_song).model_dump_json().encode()
+    return etag_response(request, key, body, tags=[
+        f"matched:{matched_id}",
+        f"songs:{matched_song.get('song_id')}",
+        f"lyrics:{matched_song.get('lyrics_id')}",
+        f"users:{matched_song.get('created_by_user_id')}"
+    ], since=since)
 
 
 @router.post("/", response_model=MatchedResponse)
@@ -68,7 +119,10 @@ async def create_matched_song(matched_data: MatchedCreate):
     """Create a new matched song-lyrics pair."""
     try:
         matched_song = await supabase_service.create("matched", matched_data.model_dump())
+        song_search_index.upsert_match(matched_song)
         return matched_song
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create matched song: {str(e)}")
 
@@ -76,32 +130,35 @@ async def create_matched_song(matched_data: MatchedCreate):
 @router.put("/{matched_id}", response_model=MatchedResponse)
 async def update_matched_song(matched_id: int, matched_data: MatchedUpdate):
     """Update a matched song."""
-    matched_song = await supabase_service.get("matched", matched_id)
-    if not matched_song:
-        raise HTTPException(status_code=404, detail="Matched song not found")
-    
     try:
         updated_matched_song = await supabase_service.update("matched", matched_id, matched_data.model_dump())
-        return updated_matched_song
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update matched song: {str(e)}")
+    
+    if not updated_matched_song:
+        raise HTTPException(status_code=404, detail="Matched song not found")
+    song_search_index.upsert_match(updated_matched_song)
+    response_validators.invalidate_tag(f"matched:{matched_id}")
+    return updated_matched_song
 
 
 @router.delete("/{matched_id}")
 async def delete_matched_song(matched_id: int):
     """Delete a matched song."""
-    matched_song = await supabase_service.get("matched", matched_id)
-    if not matched_song:
-        raise HTTPException(status_code=404, detail="Matched song not found")
-    
     try:
         success = await supabase_service.delete("matched", matched_id)
-        if success:
-            return {"message": "Matched song deleted successfully"}
-        else:
-            raise HTTPException(status_code=500, detail="Failed to delete matched song")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete matched song: {str(e)}")
+    
+    if not success:
+        raise HTTPException(status_code=404, detail="Matched song not found")
+    song_search_index.remove_match(matched_id)
+    response_validators.invalidate_tag(f"matched:{matched_id}")
+    return {"message": "Matched song deleted successfully"}
 
 
 @router.get("/search/existing")
@@ -122,5 +179,7 @@ async def search_existing_matched_songs(
         
         matched_songs = await supabase_service.search("matched", filters)
         return matched_songs
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to search matched songs: {str(e)}")
@@ -0,0 +1,121 @@
+"""
+Prometheus exposition endpoint.
+"""
+from typing import Any, Dict, List
+
+from fastapi import APIRouter, Response
+
+from services.auth_service import token_verifier
+from services.conditional import response_validators
+from services.deadline import DeadlineMiddleware
+from services.http_client import http_client
+from services.lyric_timing import lyric_timing_indexes
+from services.metrics import CONTENT_TYPE, loop_lag_monitor, registry, render_family
+from services.progress_buffer import progress_buffer
+from services.response_cache import response_cache
+from services.song_service import lyrics_cache
+from services.supabase_service import supabase_service
+
+router = APIRouter()
+
+CACHES = {
+    "lyrics": lyrics_cache,
+    "entity": supabase_service.entity_cache,
+    "lyric_timing": lyric_timing_indexes,
+    "verified_token": token_verifier,
+    "etag_validators": response_validators,
+    "response": response_cache,
+}
+BREAKER_STATES = ("closed", "half_open", "open")
+
+
+def _collect_pool() -> List[str]:
+    pool = http_client.pool_stats()
+    if not pool:
+        return []
+    return [
+        *render_family(
+            "ekubo_http_pool_connections", "Outbound pooled connections.", "gauge",
+            [({"state": "open"}, pool["connections"]), ({"state": "idle"}, pool["idle_connections"])]
+        ),
+        *render_family(
+            "ekubo_http_pool_requests", "Outbound requests holding or waiting for a pooled connection.", "gauge",
+            [({"state": "active"}, pool["active_requests"]), ({"state": "queued"}, pool["queued_requests"])]
+        ),
+        *render_family(
+            "ekubo_http_pool_max_connections", "Outbound connection pool size limit.", "gauge",
+            [({}, pool["max_connections"])]
+        ),
+    ]
+
+
+def _collect_caches() -> List[str]:
+    stats: Dict[str, Dict[str, Any]] = {name: cache.stats() for name, cache in CACHES.items()}
+    return [
+        *render_family(
+            "ekubo_cache_hits_total", "Cache lookups served (fresh or stale).", "counter",
+            [({"cache": name}, s["hits"] + s["stale_hits"]) for name, s in stats.items()]
+        ),
+        *render_family(
+            "ekubo_cache_misses_total", "Cache lookups that missed.", "counter",
+            [({"cache": name}, s["misses"]) for name, s in stats.items()]
+        ),
+        *render_family(
+            "ekubo_cache_hit_ratio", "Share of cache lookups served since startup.", "gauge",
+            [({"cache": name}, s["hit_ratio"]) for name, s in stats.items()]
+        ),
+        *render_family(
+            "ekubo_cache_entries", "Entries currently cached.", "gauge",
+            [({"cache": name}, s["entries"]) for name, s in stats.items()]
+        ),
+    ]
+
+
+def _collect_upstream() -> List[str]:
+    coalesced = supabase_service.inflight.stats()
+    resilience = supabase_service.resilience.stats()
+    return [
+        *render_family(
+            "ekubo_supabase_coalesced_reads_total", "GETs that joined an identical in-flight call.", "counter",
+            [({}, coalesced["coalesced"])]
+        ),
+        *render_family(
+            "ekubo_supabase_hedges_total", "Hedged Supabase GET attempts.", "counter",
+            [({}, resilience["hedges"])]
+        ),
+        *render_family(
+            "ekubo_supabase_retries_total", "Retried Supabase GET attempts.", "counter",
+            [({}, resilience["retries"])]
+        ),
+        *render_family(
+            "ekubo_supabase_breaker_state", "Supabase circuit breaker state (1 for the current state).", "gauge",
+            [({"state": state}, int(state == resilience["breaker_state"])) for state in BREAKER_STATES]
+        ),
+        *render_family(
+            "ekubo_request_deadline_exceeded_total", "Requests answered with 504 after running out of budget.", "counter",
+            [({}, DeadlineMiddleware.stats()["exceeded"])]
+        ),
+    ]
+
+
+def _collect_runtime() -> List[str]:
+    return [
+        *render_family(
+            "ekubo_event_loop_lag_last_seconds", "Most recently measured event loop lag.", "gauge",
+            [({}, loop_lag_monitor.last_lag)]
+        ),
+        *render_family(
+            "ekubo_progress_buffered_events", "Progress events waiting for the next bulk write.", "gauge",
+            [({}, progress_buffer.buffered)]
+        ),
+    ]
+
+
+for _collector in (_collect_pool, _collect_caches, _collect_upstream, _collect_runtime):
+    registry.add_collector(_collector)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Expose metrics in the Prometheus text format."""
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
@@ -1,10 +1,16 @@
 """
 Enhanced songs router for managing songs.
 """
-from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Query
+import json
+from typing import List, Literal, Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 
-from models import SongCreate, SongResponse, SongUpdate
+from models import SongCreate, SongResponse, SongSummary, SongUpdate
+from services.conditional import cached_not_modified, etag_response, response_validators
+from services.pagination import cursor_after_id, set_next_cursor
+from services.passthrough import can_pass_through, list_select, passthrough_page, passthrough_select, projection_select
+from services.song_search import song_search_index
+from services.streaming import ndjson_response, wants_ndjson
 from services.supabase_service import supabase_service
 
 router = APIRouter()
@@ -12,12 +18,20 @@ router = APIRouter()
 
 @router.get("/", response_model=List[SongResponse])
 async def get_songs(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0, description="Number of songs to skip"),
     limit: int = Query(100, ge=1, le=1000, description="Number of songs to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from X-Next-Cursor; takes precedence over skip"),
     title: Optional[str] = Query(None, description="Filter by song title"),
-    artist: Optional[str] = Query(None, description="Filter by artist name")
+    artist: Optional[str] = Query(None, description="Filter by artist name"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return (e.g. title,artist); id is always included"),
+    view: Literal["full", "summary"] = Query("full", description="summary returns SongSummary rows; ignored when fields is set"),
+    stream: bool = Query(False, description="Stream rows as NDJSON (same as Accept: application/x-ndjson)")
 ):
-    """Get all songs with pagination and optional filters."""
+    """Get all songs with pagination, optional filters and column projection."""
+    after_id = cursor_after_id(cursor)
+    select = list_select(SongResponse, fields, SongSummary, view)
     try:
         filters = {}
         if title:
@@ -25,25 +39,66 @@ async def get_songs(
         if artist:
             filters["artist"] = artist
         
+        if wants_ndjson(request, stream):
+            return await ndjson_response(
+                supabase_service.stream_multi(
+                    "songs", skip=skip, limit=limit, filters=filters, after_id=after_id, select=select
+                ),
+                None if select else SongResponse
+            )
+        
+        if select or can_pass_through(SongResponse):
+            return await passthrough_page(
+                "songs",
+                select or passthrough_select(SongResponse),
+                skip=skip,
+                limit=limit,
+                filters=filters,
+                after_id=after_id
+            )
+        
         if filters:
-            songs = await supabase_service.search("songs", filters, skip=skip, limit=limit)
+            songs = await supabase_service.search("songs", filters, skip=skip, limit=limit, after_id=after_id)
         else:
-            songs = await supabase_service.get_multi("songs", skip=skip, limit=limit)
+            songs = await supabase_service.get_multi("songs", skip=skip, limit=limit, after_id=after_id)
+        set_next_cursor(response, songs, limit)
         return songs
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch songs: {str(e)}")
 
 
 @router.get("/{song_id}", response_model=SongResponse)
-async def get_song(song_id: int):
-    """Get a specific song by ID."""
+async def get_song(
+    song_id: int,
+    request: Request,
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return (e.g. title,artist); id is always included")
+):
+    """Get a specific song by ID. Supports If-None-Match."""
+    select = projection_select(fields, SongResponse) if fields else None
+    key = ("song", song_id, select)
+    not_modified = cached_not_modified(request, key)
+    if not_modified is not None:
+        return not_modified
+    
+    since = response_validators.mark()
     try:
         song = await supabase_service.get("songs", song_id)
-        if not song:
-            raise HTTPException(status_code=404, detail="Song not found")
-        return song
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch song: {str(e)}")
+    
+    if not song:
+        raise HTTPException(status_code=404, detail="Song not found")
+    if select:
+        # Projected from the (cached) full row rather than a separate query
+        projected = {column: song.get(column) for column in select.split(",")}
+        body = json.dumps(projected, ensure_ascii=False, separators=(",", ":")).encode()
+    else:
+        body = SongResponse.model_validate(song).model_dump_json().encode()
+    return etag_response(request, key, body, tags=[f"songs:{song_id}"], since=since)
 
 
 @router.post("/", response_model=SongResponse)
@@ -51,7 +106,10 @@ async def create_song(song_data: SongCreate):
     """Create a new song."""
     try:
         song = await supabase_service.create("songs", song_data.model_dump())
+        song_search_index.upsert_song(song)
         return song
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create song: {str(e)}")
 
@@ -59,29 +117,32 @@ async def create_song(song_data: SongCreate):
 @router.put("/{song_id}", response_model=SongResponse)
 async def update_song(song_id: int, song_data: SongUpdate):
     """Update a song."""
-    song = await supabase_service.get("songs", song_id)
-    if not song:
-        raise HTTPException(status_code=404, detail="Song not found")
-    
     try:
         updated_song = await supabase_service.update("songs", song_id, song_data.model_dump())
-        return updated_song
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update song: {str(e)}")
+    
+    if not updated_song:
+        raise HTTPException(status_code=404, detail="Song not found")
+    song_search_index.upsert_song(updated_song)
+    response_validators.invalidate_tag(f"songs:{song_id}")
+    return updated_song
 
 
 @router.delete("/{song_id}")
 async def delete_song(song_id: int):
     """Delete a song."""
-    song = await supabase_service.get("songs", song_id)
-    if not song:
-        raise HTTPException(status_code=404, detail="Song not found")
-    
     try:
         success = await supabase_service.delete("songs", song_id)
-        if success:
-            return {"message": "Song deleted successfully"}
-        else:
-            raise HTTPException(status_code=500, detail="Failed to delete song")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete song: {str(e)}")
+    
+    if not success:
+        raise HTTPException(status_code=404, detail="Song not found")
+    song_search_index.remove_song(song_id)
+    response_validators.invalidate_tag(f"songs:{song_id}")
+    return {"message": "Song deleted successfully"}
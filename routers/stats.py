@@ -0,0 +1,42 @@
+"""
+Stats router exposing in-process cache and worker pool counters.
+"""
+from fastapi import APIRouter
+
+from services.auth_service import token_verifier
+from services.conditional import response_validators
+from services.deadline import DeadlineMiddleware
+from services.http_client import http_client
+from services.lyric_search import lyric_search_index
+from services.lyric_timing import lyric_timing_indexes
+from services.password_service import password_hasher
+from services.progress_buffer import progress_buffer
+from services.progress_stats import progress_aggregates
+from services.response_cache import response_cache
+from services.song_search import song_search_index
+from services.song_service import lyrics_cache_stats
+from services.supabase_service import supabase_service
+
+router = APIRouter()
+
+
+@router.get("/")
+async def get_stats():
+    """Get counters for the in-process caches and worker pools."""
+    return {
+        "lyrics_cache": lyrics_cache_stats(),
+        "entity_cache": supabase_service.entity_cache.stats(),
+        "coalesced_reads": supabase_service.inflight.stats(),
+        "supabase_resilience": supabase_service.resilience.stats(),
+        "request_deadlines": DeadlineMiddleware.stats(),
+        "http_pool": http_client.pool_stats(),
+        "lyric_timing_indexes": lyric_timing_indexes.stats(),
+        "password_hash_pool": password_hasher.stats(),
+        "verified_token_cache": token_verifier.stats(),
+        "progress_buffer": progress_buffer.stats(),
+        "progress_aggregates": progress_aggregates.stats(),
+        "song_search_index": song_search_index.stats(),
+        "lyric_search_index": lyric_search_index.stats(),
+        "etag_validators": response_validators.stats(),
+        "response_cache": response_cache.stats(),
+    }
@@ -1,10 +1,14 @@
 """
 User Library router for managing user's song library.
 """
-from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Query
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 
 from models import UserLibraryCreate, UserLibraryResponse, UserLibraryUpdate, UserLibraryWithDetails
+from services.auth_service import ensure_same_user, get_current_user, user_from_claims
+from services.pagination import cursor_after_id, set_next_cursor
+from services.passthrough import can_pass_through, list_select, passthrough_page, passthrough_select
+from services.streaming import ndjson_response, wants_ndjson
 from services.supabase_service import supabase_service
 
 router = APIRouter()
@@ -12,87 +16,155 @@ router = APIRouter()
 
 @router.get("/", response_model=List[UserLibraryResponse])
 async def get_user_libraries(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0, description="Number of library entries to skip"),
-    limit: int = Query(100, ge=1, le=1000, description="Number of library entries to return")
+    limit: int = Query(100, ge=1, le=1000, description="Number of library entries to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from X-Next-Cursor; takes precedence over skip"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return (e.g. matched_song_id); id is always included"),
+    stream: bool = Query(False, description="Stream rows as NDJSON (same as Accept: application/x-ndjson)"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
 ):
-    """Get all user library entries with pagination."""
+    """Get the caller's library entries with pagination and optional column projection."""
+    after_id = cursor_after_id(cursor)
+    select = list_select(UserLibraryResponse, fields)
+    filters = {"user_id": current_user["id"]}
     try:
-        library_entries = await supabase_service.get_multi("user_library", skip=skip, limit=limit)
+        if wants_ndjson(request, stream):
+            return await ndjson_response(
+                supabase_service.stream_multi(
+                    "user_library", skip=skip, limit=limit, filters=filters, after_id=after_id, select=select
+                ),
+                None if select else UserLibraryResponse
+            )
+        
+        if select or can_pass_through(UserLibraryResponse):
+            return await passthrough_page(
+                "user_library",
+                select or passthrough_select(UserLibraryResponse),
+                skip=skip,
+                limit=limit,
+                filters=filters,
+                after_id=after_id
+            )
+        
+        library_entries = await supabase_service.get_multi(
+            "user_library", skip=skip, limit=limit, filters=filters, after_id=after_id
+        )
+        set_next_cursor(response, library_entries, limit)
         return library_entries
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch user library entries: {str(e)}")
 
 
+async def _load_user_library(user_id: int, current_user: Dict[str, Any]) -> List[Dict[str, Any]]:
+    library_entries = await supabase_service.search("user_library", {"user_id": user_id})
+    
+    # The caller's own user row comes from the token claims instead of a lookup
+    user = user_from_claims(current_user, user_id)
+    relations = {"matched_song": ("matched", "matched_song_id")}
+    if user is None:
+        relations["user"] = ("users", "user_id")
+    else:
+        for entry in library_entries:
+            entry["user"] = user
+    
+    # Load details for all entries with a fixed number of batched queries
+    await supabase_service.attach_related(library_entries, relations)
+    
+    matched_songs = [entry["matched_song"] for entry in library_entries if entry.get("matched_song")]
+    await supabase_service.attach_related(matched_songs, {
+        "song": ("songs", "song_id"),
+        "lyrics": ("lyrics", "lyrics_id")
+    })
+    
+    return library_entries
+
+
+async def _get_owned_entry(library_id: int, current_user: Dict[str, Any]) -> Dict[str, Any]:
+    """Get a library entry, raising 404 if it is missing and 403 if it belongs to another user."""
+    try:
+        library_entry = await supabase_service.get("user_library", library_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch library entry: {str(e)}")
+    
+    if not library_entry:
+        raise HTTPException(status_code=404, detail="Library entry not found")
+    ensure_same_user(current_user, library_entry["user_id"])
+    return library_entry
+
+
+async def _raise_not_owned(library_id: int, current_user: Dict[str, Any]):
+    """Explain a write that matched no row of the caller: 404 if the entry is missing, else 403."""
+    await _get_owned_entry(library_id, current_user)
+    # The caller's entry exists now but did not when written (or is a stale cached copy)
+    raise HTTPException(status_code=404, detail="Library entry not found")
+
+
 @router.get("/user/{user_id}", response_model=List[UserLibraryWithDetails])
-async def get_user_library(user_id: int):
+async def get_user_library(user_id: int, current_user: Dict[str, Any] = Depends(get_current_user)):
     """Get a specific user's library with full details."""
+    ensure_same_user(current_user, user_id)
     try:
-        library_entries = await supabase_service.search("user_library", {"user_id": user_id})
-        
-        # Get full details for each entry
-        detailed_entries = []
-        for entry in library_entries:
-            if entry.get("matched_song_id"):
-                matched_song = await supabase_service.get("matched", entry["matched_song_id"])
-                if matched_song:
-                    # Get song and lyrics details
-                    if matched_song.get("song_id"):
-                        song = await supabase_service.get("songs", matched_song["song_id"])
-                        matched_song["song"] = song
-                    
-                    if matched_song.get("lyrics_id"):
-                        lyrics = await supabase_service.get("lyrics", matched_song["lyrics_id"])
-                        matched_song["lyrics"] = lyrics
-                    
-                    entry["matched_song"] = matched_song
-            
-            if entry.get("user_id"):
-                user = await supabase_service.get("users", entry["user_id"])
-                entry["user"] = user
-            
-            detailed_entries.append(entry)
-        
-        return detailed_entries
+        return await _load_user_library(user_id, current_user)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch user library: {str(e)}")
+
+
+@router.get("/me", response_model=List[UserLibraryWithDetails])
+async def get_my_library(current_user: Dict[str, Any] = Depends(get_current_user)):
+    """Get the authenticated user's library with full details."""
+    try:
+        return await _load_user_library(current_user["id"], current_user)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch user library: {str(e)}")
 
 
 @router.get("/{library_id}", response_model=UserLibraryWithDetails)
-async def get_library_entry(library_id: int):
-    """Get a specific library entry by ID with full details."""
+async def get_library_entry(library_id: int, current_user: Dict[str, Any] = Depends(get_current_user)):
+    """Get one of the caller's library entries by ID with full details."""
+    library_entry = await _get_owned_entry(library_id, current_user)
     try:
-        library_entry = await supabase_service.get("user_library", library_id)
-        if not library_entry:
-            raise HTTPException(status_code=404, detail="Library entry not found")
+        relations = {"matched_song": ("matched", "matched_song_id")}
+        user = user_from_claims(current_user, library_entry.get("user_id"))
+        if user is None:
+            relations["user"] = ("users", "user_id")
+        else:
+            library_entry["user"] = user
         
-        # Get matched song details
-        if library_entry.get("matched_song_id"):
-            matched_song = await supabase_service.get("matched", library_entry["matched_song_id"])
-            if matched_song:
-                # Get song and lyrics details
-                if matched_song.get("song_id"):
-                    song = await supabase_service.get("songs", matched_song["song_id"])
-                    matched_song["song"] = song
-                
-                if matched_song.get("lyrics_id"):
-                    lyrics = await supabase_service.get("lyrics", matched_song["lyrics_id"])
-                    matched_song["lyrics"] = lyrics
-                
-                library_entry["matched_song"] = matched_song
+        # Get matched song and user details concurrently
+        await supabase_service.attach_related([library_entry], relations)
         
-        # Get user details
-        if library_entry.get("user_id"):
-            user = await supabase_service.get("users", library_entry["user_id"])
-            library_entry["user"] = user
+        matched_song = library_entry.get("matched_song")
+        if matched_song:
+            # Get song and lyrics details
+            await supabase_service.attach_related([matched_song], {
+                "song": ("songs", "song_id"),
+                "lyrics": ("lyrics", "lyrics_id")
+            })
         
         return library_entry
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch library entry: {str(e)}")
 
 
 @router.post("/", response_model=UserLibraryResponse)
-async def add_to_library(library_data: UserLibraryCreate):
+async def add_to_library(
+    library_data: UserLibraryCreate,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
     """Add a song to user's library."""
+    ensure_same_user(current_user, library_data.user_id)
     try:
         # Check if the entry already exists
         existing_entries = await supabase_service.search("user_library", {
@@ -105,36 +177,49 @@ async def add_to_library(library_data: UserLibraryCreate):
         
         library_entry = await supabase_service.create("user_library", library_data.model_dump())
         return library_entry
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to add to library: {str(e)}")
 
 
 @router.put("/{library_id}", response_model=UserLibraryResponse)
-async def update_library_entry(library_id: int, library_data: UserLibraryUpdate):
-    """Update a library entry."""
-    library_entry = await supabase_service.get("user_library", library_id)
-    if not library_entry:
-        raise HTTPException(status_code=404, detail="Library entry not found")
-    
+async def update_library_entry(
+    library_id: int,
+    library_data: UserLibraryUpdate,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Update one of the caller's library entries; only the fields sent are changed."""
+    changes = library_data.model_dump(exclude_unset=True)
+    if changes.get("user_id") is not None:
+        ensure_same_user(current_user, changes["user_id"])
+    if not changes:
+        return await _get_owned_entry(library_id, current_user)
     try:
-        updated_entry = await supabase_service.update("user_library", library_id, library_data.model_dump())
-        return updated_entry
+        # Scoped to the caller's rows, so ownership is checked by the write itself
+        updated_entry = await supabase_service.update(
+            "user_library", library_id, changes, filters={"user_id": current_user["id"]}
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update library entry: {str(e)}")
+    
+    if not updated_entry:
+        await _raise_not_owned(library_id, current_user)
+    return updated_entry
 
 
 @router.delete("/{library_id}")
-async def remove_from_library(library_id: int):
-    """Remove a song from user's library."""
-    library_entry = await supabase_service.get("user_library", library_id)
-    if not library_entry:
-        raise HTTPException(status_code=404, detail="Library entry not found")
-    
+async def remove_from_library(library_id: int, current_user: Dict[str, Any] = Depends(get_current_user)):
+    """Remove a song from the caller's library."""
     try:
-        success = await supabase_service.delete("user_library", library_id)
-        if success:
-            return {"message": "Song removed from library successfully"}
-        else:
-            raise HTTPException(status_code=500, detail="Failed to remove from library")
+        success = await supabase_service.delete("user_library", library_id, filters={"user_id": current_user["id"]})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to remove from library: {str(e)}")
+    
+    if not success:
+        await _raise_not_owned(library_id, current_user)
+    return {"message": "Song removed from library successfully"}
@@ -0,0 +1,210 @@
+"""
+User progress router for practice sessions and progress event ingestion.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Literal, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+
+from models import (
+    PracticeSessionCreate,
+    PracticeSessionResponse,
+    ProgressIngestResponse,
+    ProgressStats,
+    ProgressStatsRebuildResponse,
+    UserProgressCreate
+)
+from services.auth_service import ensure_same_user, get_admin_user, get_current_user
+from services.progress_buffer import progress_buffer
+from services.progress_stats import SESSION, USER, USER_SONG, progress_aggregates
+from services.supabase_service import supabase_service
+
+router = APIRouter()
+
+
+async def _ingest_events(
+    events: List[UserProgressCreate],
+    ack: str,
+    response: Response,
+    current_user: Dict[str, Any]
+) -> Dict[str, Any]:
+    for event in events:
+        ensure_same_user(current_user, event.user_id)
+    # Session rows are entity-cached, so checking each distinct session is cheap
+    for session_id in {event.practice_session_id for event in events if event.practice_session_id is not None}:
+        await _get_owned_session(session_id, current_user)
+
+    durable = ack == "durable"
+    accepted = await progress_buffer.add([event.model_dump() for event in events], wait=durable)
+    response.status_code = 201 if durable else 202
+    return {"accepted": accepted, "durable": durable}
+
+
+async def _get_owned_session(
+    session_id: int,
+    current_user: Dict[str, Any],
+    use_cache: bool = True
+) -> Dict[str, Any]:
+    """Get a practice session, raising 404 if it is missing and 403 if it belongs to another user."""
+    try:
+        session = await supabase_service.get("practice_sessions", session_id, use_cache=use_cache)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch practice session: {str(e)}")
+
+    if not session:
+        raise HTTPException(status_code=404, detail="Practice session not found")
+    ensure_same_user(current_user, session["user_id"])
+    return session
+
+
+@router.post("/events", response_model=ProgressIngestResponse, status_code=201)
+async def create_progress_events(
+    events: Union[UserProgressCreate, List[UserProgressCreate]],
+    response: Response,
+    ack: Literal["durable", "buffered"] = Query(
+        "durable",
+        description="durable: respond once the events are stored; buffered: respond once they are queued"
+    ),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Record one or many progress events, written to the database in batches."""
+    if not isinstance(events, list):
+        events = [events]
+    return await _ingest_events(events, ack, response, current_user)
+
+
+@router.post("/sessions", response_model=PracticeSessionResponse)
+async def create_practice_session(
+    session_data: PracticeSessionCreate,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Start a new practice session."""
+    ensure_same_user(current_user, session_data.user_id)
+    try:
+        session = await supabase_service.create("practice_sessions", session_data.model_dump(mode="json"))
+        return session
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to create practice session: {str(e)}")
+
+
+@router.get("/sessions/{session_id}", response_model=PracticeSessionResponse)
+async def get_practice_session(
+    session_id: int,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Get a practice session by ID."""
+    session = await _get_owned_session(session_id, current_user)
+    
+    # Sessions still in progress report their running counters
+    if session.get("ended_at") is None:
+        try:
+            session.update(await progress_aggregates.get(SESSION, session_id))
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to fetch session stats: {str(e)}")
+    return session
+
+
+@router.post("/sessions/{session_id}/end", response_model=PracticeSessionResponse)
+async def end_practice_session(
+    session_id: int,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """End a practice session, storing its final line counts and accuracy."""
+    await _get_owned_session(session_id, current_user, use_cache=False)
+
+    try:
+        # Make sure events still sitting in the buffer are counted
+        await progress_buffer.flush_detached()
+        summary = await progress_aggregates.get(SESSION, session_id)
+        updated_session = await supabase_service.update("practice_sessions", session_id, {
+            "ended_at": datetime.now(timezone.utc).isoformat(),
+            **summary
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to end practice session: {str(e)}")
+
+    if not updated_session:
+        raise HTTPException(status_code=404, detail="Practice session not found")
+    return updated_session
+
+
+@router.post("/sessions/{session_id}/events", response_model=ProgressIngestResponse, status_code=201)
+async def create_session_events(
+    session_id: int,
+    events: Union[UserProgressCreate, List[UserProgressCreate]],
+    response: Response,
+    ack: Literal["durable", "buffered"] = Query(
+        "durable",
+        description="durable: respond once the events are stored; buffered: respond once they are queued"
+    ),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Record one or many progress events for a practice session."""
+    await _get_owned_session(session_id, current_user)
+    if not isinstance(events, list):
+        events = [events]
+    for event in events:
+        event.practice_session_id = session_id
+    return await _ingest_events(events, ack, response, current_user)
+
+
+@router.get("/stats/sessions/{session_id}", response_model=ProgressStats)
+async def get_session_stats(session_id: int, current_user: Dict[str, Any] = Depends(get_current_user)):
+    """Get running accuracy counters for a practice session."""
+    await _get_owned_session(session_id, current_user)
+    try:
+        return await progress_aggregates.get(SESSION, session_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch session stats: {str(e)}")
+
+
+@router.get("/stats/users/{user_id}", response_model=ProgressStats)
+async def get_user_stats(
+    user_id: int,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Get running accuracy counters across all of a user's practice."""
+    ensure_same_user(current_user, user_id)
+    try:
+        return await progress_aggregates.get(USER, user_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch user stats: {str(e)}")
+
+
+@router.get("/stats/users/{user_id}/songs/{matched_song_id}", response_model=ProgressStats)
+async def get_user_song_stats(
+    user_id: int,
+    matched_song_id: int,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Get running accuracy counters for a user's practice of one matched song."""
+    ensure_same_user(current_user, user_id)
+    try:
+        return await progress_aggregates.get(USER_SONG, (user_id, matched_song_id))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch user song stats: {str(e)}")
+
+
+@router.post("/stats/rebuild", response_model=ProgressStatsRebuildResponse)
+async def rebuild_progress_stats(current_user: Dict[str, Any] = Depends(get_admin_user)):
+    """Recompute all counters from the raw progress rows and report any drift. Admins only."""
+    try:
+        await progress_buffer.flush_detached()
+        return await progress_aggregates.rebuild()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to rebuild progress stats: {str(e)}")
@@ -0,0 +1,112 @@
+"""
+JWT issuing and verification.
+
+Tokens are verified locally (no database round trip) and recently verified
+tokens are kept in a small LRU so hot clients skip signature checks.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+import jwt
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from config import settings
+from services.cache import TTLCache
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+# Claims copied from the users row into the token, enough to build a UserResponse
+USER_CLAIMS = ("id", "email", "username", "created_at")
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+
+class TokenVerifier:
+    """Verifies HS256 access tokens, caching the claims of recently verified ones."""
+
+    def __init__(self, secret: str, algorithm: str, expiration_hours: int, max_entries: int):
+        self.secret = secret
+        self.algorithm = algorithm
+        self.expiration = timedelta(hours=expiration_hours)
+        self._verified = TTLCache(max_entries=max_entries)
+
+    def create_token(self, user: Dict[str, Any]) -> str:
+        """Issue an access token for a users row."""
+        now = datetime.now(timezone.utc)
+        claims = {key: user.get(key) for key in USER_CLAIMS}
+        claims["iat"] = now
+        claims["exp"] = now + self.expiration
+        return jwt.encode(claims, self.secret, algorithm=self.algorithm)
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Get a token's claims, raising 401 if it is invalid or expired."""
+        claims = self._verified.get(token)
+        if claims is not None:
+            return claims
+
+        try:
+            claims = jwt.decode(
+                token,
+                self.secret,
+                algorithms=[self.algorithm],
+                options={"require": ["exp", "iat", "id"]}
+            )
+        except jwt.ExpiredSignatureError:
+            raise _unauthorized("Token has expired")
+        except jwt.InvalidTokenError:
+            raise _unauthorized("Invalid token")
+
+        # Reject tokens issued with a longer lifetime than the current setting allows
+        now = datetime.now(timezone.utc).timestamp()
+        expires_at = min(claims["exp"], claims["iat"] + self.expiration.total_seconds())
+        if expires_at <= now:
+            raise _unauthorized("Token has expired")
+
+        self._verified.set(token, claims, ttl_seconds=expires_at - now)
+        return claims
+
+    def stats(self) -> Dict[str, Any]:
+        return self._verified.stats()
+
+
+# Create global instance
+token_verifier = TokenVerifier(
+    secret=settings.jwt_secret,
+    algorithm=settings.jwt_algorithm,
+    expiration_hours=settings.jwt_expiration_hours,
+    max_entries=settings.jwt_verified_cache_max_entries
+)
+
+
+async def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)
+) -> Dict[str, Any]:
+    """Dependency returning the token claims, requiring a valid bearer token."""
+    if credentials is None:
+        raise _unauthorized("Not authenticated")
+    return token_verifier.verify(credentials.credentials)
+
+
+async def get_admin_user(current_user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+    """Dependency returning the token claims, requiring a user listed in `admin_user_ids`."""
+    if current_user["id"] not in settings.admin_user_ids:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+
+def user_from_claims(claims: Optional[Dict[str, Any]], user_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Build a users row from token claims, or None if they lack fields or belong to another user."""
+    if not claims or any(claims.get(key) is None for key in ("id", "username", "created_at")):
+        return None
+    if user_id is not None and claims["id"] != user_id:
+        return None
+    return {key: claims.get(key) for key in USER_CLAIMS}
+
+
+def ensure_same_user(claims: Dict[str, Any], user_id: int):
+    """Raise 403 when the caller acts on another user's data."""
+    if claims["id"] != user_id:
+        raise HTTPException(status_code=403, detail="Not allowed to access another user's data")
@@ -0,0 +1,335 @@
+"""
+In-process caching primitives shared by the services.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Lookup outcomes returned by TTLCache.lookup()
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+
+def estimate_size(value: Any) -> int:
+    """Cheap approximation of the memory held by a JSON-like value, in bytes."""
+    if isinstance(value, str):
+        return 49 + len(value)
+    if isinstance(value, dict):
+        return 64 + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 56 + sum(estimate_size(item) for item in value)
+    return 32
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries expire after a TTL.
+
+    Entries past their TTL are kept for a further `stale_seconds` so callers
+    can serve them while refreshing in the background (stale-while-revalidate).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 300.0,
+        stale_seconds: float = 0.0,
+        max_bytes: Optional[int] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, key: Hashable) -> Tuple[str, Any]:
+        """Return `(FRESH | STALE | MISS, value)` for a key."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISS, None
+
+        value, expires_at, stale_until, _ = entry
+        now = time.monotonic()
+        if now < expires_at:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return FRESH, value
+        if now < stale_until:
+            self._entries.move_to_end(key)
+            self.stale_hits += 1
+            return STALE, value
+
+        self._remove(key)
+        self.misses += 1
+        return MISS, None
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a fresh value for a key, or `default`."""
+        status, value = self.lookup(key)
+        return value if status == FRESH else default
+
+    def peek(self, key: Hashable) -> Any:
+        """Return a fresh value for a key, or None, without counting a lookup or refreshing its LRU position."""
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() >= entry[1]:
+            return None
+        return entry[0]
+
+    def keys(self) -> List[Hashable]:
+        """Return the keys of fresh entries, least recently used first."""
+        now = time.monotonic()
+        return [key for key, entry in self._entries.items() if now < entry[1]]
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None, size: Optional[int] = None):
+        """Store a value, evicting the least recently used entries when full."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        if self.max_bytes is None:
+            size = 0
+        elif size is None:
+            size = estimate_size(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            self._remove(key)
+            return
+
+        self._remove(key)
+        expires_at = time.monotonic() + ttl
+        self._entries[key] = (value, expires_at, expires_at + self.stale_seconds, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self._bytes > self.max_bytes
+        ):
+            _, (_, _, _, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[3]
+
+    def invalidate(self, key: Hashable):
+        self._remove(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+        }
+
+
+class TaggedTTLCache(TTLCache):
+    """
+    TTLCache whose entries can also be invalidated through tags.
+
+    Each entry is stored with the tags of the rows it was built from (e.g.
+    `lyrics:5`), and `invalidate_tag` drops every entry carrying a tag.
+    Callers take a `mark()` before loading a value and pass it as `since`
+    so a value loaded while one of its tags was invalidated is not stored.
+    """
+
+    # Shared by all instances so marks are comparable across caches
+    _clock = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._keys_by_tag: Dict[str, Set[Hashable]] = {}
+        self._tag_versions: "OrderedDict[str, int]" = OrderedDict()
+        # Invalidations at or before this clock value may have been forgotten
+        self._forgotten_before = 0
+        self.tag_invalidations = 0
+
+    @staticmethod
+    def mark() -> int:
+        return TaggedTTLCache._clock
+
+    def changed_since(self, tags: Iterable[str], since: int) -> bool:
+        if since < self._forgotten_before:
+            return True
+        return any(self._tag_versions.get(tag, 0) > since for tag in tags)
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl_seconds: Optional[float] = None,
+        size: Optional[int] = None,
+        tags: Iterable[str] = (),
+        since: Optional[int] = None
+    ):
+        tags = list(tags)
+        if since is not None and self.changed_since(tags, since):
+            return
+        super().set(key, value, ttl_seconds=ttl_seconds, size=size)
+        for tag in tags:
+            self._keys_by_tag.setdefault(tag, set()).add(key)
+        if len(self._keys_by_tag) > 2 * self.max_entries:
+            self._prune_tags()
+
+    def _prune_tags(self):
+        # Drop references to keys that were evicted or expired
+        for tag in list(self._keys_by_tag):
+            keys = {key for key in self._keys_by_tag[tag] if key in self._entries}
+            if keys:
+                self._keys_by_tag[tag] = keys
+            else:
+                del self._keys_by_tag[tag]
+
+    def invalidate_tag(self, tag: str):
+        """Drop every entry stored with `tag`."""
+        TaggedTTLCache._clock += 1
+        self._tag_versions[tag] = TaggedTTLCache._clock
+        self._tag_versions.move_to_end(tag)
+        if len(self._tag_versions) > self.max_entries:
+            _, version = self._tag_versions.popitem(last=False)
+            self._forgotten_before = version
+
+        for key in self._keys_by_tag.pop(tag, ()):
+            if key in self._entries:
+                self._remove(key)
+                self.tag_invalidations += 1
+
+    def clear(self):
+        super().clear()
+        self._keys_by_tag.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "tags": len(self._keys_by_tag),
+            "tag_invalidations": self.tag_invalidations,
+        }
+
+
+class SQLiteCacheStore:
+    """
+    On-disk key/value tier for caches that should survive restarts.
+
+    Values are stored as JSON with the wall-clock time they were written;
+    SQLite calls run in a worker thread so they never block the event loop.
+    """
+
+    def __init__(self, path: str, table: str = "cache", max_entries: Optional[int] = None):
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.pruned = 0
+        self._pruner: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_stored_at ON {table} (stored_at)")
+            self._conn.commit()
+
+    def _get(self, key: str) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def _set(self, key: str, value: Any, stored_at: float):
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, payload, stored_at)
+            )
+            self._conn.commit()
+
+    def _prune(self, older_than: float) -> int:
+        with self._lock:
+            removed = self._conn.execute(f"DELETE FROM {self.table} WHERE stored_at < ?", (older_than,)).rowcount
+            if self.max_entries is not None:
+                # Keep only the newest `max_entries` rows
+                removed += self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN "
+                    f"(SELECT key FROM {self.table} ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                ).rowcount
+            self._conn.commit()
+            return removed
+
+    async def get(self, key: str, max_age_seconds: float) -> Optional[Tuple[Any, float]]:
+        """Return `(value, age_seconds)` if the key was stored within `max_age_seconds`."""
+        result = await asyncio.to_thread(self._get, key)
+        if result is not None:
+            value, stored_at = result
+            age = time.time() - stored_at
+            if age < max_age_seconds:
+                self.hits += 1
+                return value, age
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Any):
+        await asyncio.to_thread(self._set, key, value, time.time())
+
+    async def prune(self, max_age_seconds: float) -> int:
+        """Delete entries older than `max_age_seconds` (and the oldest beyond `max_entries`), returning how many were removed."""
+        removed = await asyncio.to_thread(self._prune, time.time() - max_age_seconds)
+        self.pruned += removed
+        return removed
+
+    async def _run_pruner(self, max_age_seconds: float, interval_seconds: float):
+        while True:
+            try:
+                await self.prune(max_age_seconds)
+            except Exception as e:
+                logger.warning("Failed to prune %s cache: %s", self.table, e)
+            await asyncio.sleep(interval_seconds)
+
+    def start_pruning(self, max_age_seconds: float, interval_seconds: float):
+        """Prune now and then every `interval_seconds`. Called from the app lifespan."""
+        if self._pruner is None:
+            self._pruner = asyncio.create_task(self._run_pruner(max_age_seconds, interval_seconds))
+
+    async def stop_pruning(self):
+        if self._pruner is not None:
+            self._pruner.cancel()
+            await asyncio.gather(self._pruner, return_exceptions=True)
+            self._pruner = None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "hits": self.hits, "misses": self.misses, "pruned": self.pruned}
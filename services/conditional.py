@@ -0,0 +1,99 @@
+"""
+ETag validators and conditional GET (If-None-Match) handling.
+
+Responses for lyrics, songs and matched songs carry a strong ETag computed
+from the serialized body. The last ETag served for each resource is
+remembered together with the rows it was built from ("tags", e.g.
+`lyrics:5`), so a matching If-None-Match is answered with 304 without
+touching Supabase until a write to one of those rows invalidates it.
+"""
+import hashlib
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+from fastapi import Request, Response
+
+from config import settings
+from services.cache import TaggedTTLCache
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+def compute_etag(body: bytes) -> str:
+    """Strong ETag for a response body."""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison, per RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class ValidatorCache(TaggedTTLCache):
+    """Last ETag served per resource key, tagged with the rows it was built from."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.not_modified = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "not_modified": self.not_modified}
+
+
+# Create global instance
+response_validators = ValidatorCache(
+    max_entries=settings.etag_validator_cache_max_entries,
+    ttl_seconds=settings.etag_validator_ttl_seconds
+)
+
+
+def _not_modified(etag: str) -> Response:
+    response_validators.not_modified += 1
+    return Response(
+        status_code=304,
+        headers={"ETag": etag, "Cache-Control": settings.http_cache_control}
+    )
+
+
+def cached_not_modified(request: Request, key: Hashable) -> Optional[Response]:
+    """Return a 304 if the request's If-None-Match matches the remembered ETag for `key`."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    etag = response_validators.get(key)
+    if etag is not None and etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    return None
+
+
+def etag_response(
+    request: Request,
+    key: Hashable,
+    body: bytes,
+    tags: Iterable[str],
+    since: Optional[int] = None
+) -> Response:
+    """
+    Send a serialized JSON body with its ETag, or a 304 if the client already has it.
+
+    `since` is a `response_validators.mark()` taken before the body was loaded.
+    """
+    etag = compute_etag(body)
+    response_validators.set(key, etag, tags=tags, since=since)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return _not_modified(etag)
+    return Response(
+        content=body,
+        media_type=JSON_MEDIA_TYPE,
+        headers={"ETag": etag, "Cache-Control": settings.http_cache_control}
+    )
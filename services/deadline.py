@@ -0,0 +1,161 @@
+"""
+Request-scoped deadlines.
+
+`DeadlineMiddleware` gives every HTTP request a time budget, taken from the
+`X-Request-Timeout-Ms` header or a per-route default. The absolute deadline
+travels in a context variable so each upstream call can use the remaining
+budget as its timeout. When the budget runs out before the response has
+started, the handler is cancelled and a 504 is sent right away.
+"""
+import asyncio
+import contextvars
+import json
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from config import settings
+
+DEADLINE_HEADER = "X-Request-Timeout-Ms"
+
+# Absolute time.monotonic() deadline of the current request, None when unbounded
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(BaseException):
+    """
+    Raised when the current request's budget is used up.
+
+    A BaseException so the routers' `except Exception` blocks do not turn it
+    into a 500; `DeadlineMiddleware` answers it with a 504.
+    """
+
+
+def remaining_budget() -> Optional[float]:
+    """Get the seconds left for the current request, or None without a deadline."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def budget_timeout(default: float) -> float:
+    """Get the timeout for the next upstream call: `default`, capped by the remaining budget."""
+    left = remaining_budget()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded()
+    return min(default, left)
+
+
+async def request_within_budget(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    timeout: Optional[float] = None,
+    **kwargs: Any
+) -> httpx.Response:
+    """Send an HTTP request whose timeout (default: the client's) is capped by the remaining request budget."""
+    left = remaining_budget()
+    if left is None:
+        return await client.request(
+            method, url, timeout=httpx.USE_CLIENT_DEFAULT if timeout is None else timeout, **kwargs
+        )
+
+    wanted = settings.http_timeout_seconds if timeout is None else timeout
+    bounded = budget_timeout(wanted)
+    try:
+        return await client.request(method, url, timeout=bounded, **kwargs)
+    except httpx.TimeoutException:
+        if bounded < wanted:
+            # Cut short by the request's deadline rather than a slow upstream
+            raise DeadlineExceeded() from None
+        raise
+
+
+def detached_context() -> contextvars.Context:
+    """Get a copy of the current context without a deadline, for tasks shared by several requests."""
+    context = contextvars.copy_context()
+    context.run(_deadline.set, None)
+    return context
+
+
+def route_budget(path: str) -> Optional[float]:
+    """Get the default budget in seconds for a path (longest matching prefix), None for unbounded."""
+    budget_ms = settings.request_deadline_default_ms
+    matched = ""
+    for prefix, prefix_ms in settings.request_deadline_route_ms.items():
+        if path.startswith(prefix) and len(prefix) > len(matched):
+            matched, budget_ms = prefix, prefix_ms
+    return budget_ms / 1000 if budget_ms > 0 else None
+
+
+def _requested_budget(headers: Dict[bytes, bytes]) -> Optional[float]:
+    value = headers.get(DEADLINE_HEADER.lower().encode())
+    if value is None:
+        return None
+    try:
+        budget_ms = float(value)
+    except ValueError:
+        return None
+    if budget_ms <= 0:
+        return None
+    return min(budget_ms, settings.request_deadline_max_ms) / 1000
+
+
+class DeadlineMiddleware:
+    """Pure ASGI middleware enforcing a per-request deadline until the response starts."""
+
+    exceeded = 0
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budget = _requested_budget(dict(scope["headers"])) or route_budget(scope["path"])
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+
+        started = False
+        timeout = asyncio.timeout(budget)
+
+        async def send_wrapper(message: Dict[str, Any]):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                # Streaming bodies may take longer than the budget; only the time to first byte is bounded
+                timeout.reschedule(None)
+            await send(message)
+
+        token = _deadline.set(time.monotonic() + budget)
+        try:
+            async with timeout:
+                await self.app(scope, receive, send_wrapper)
+        except (DeadlineExceeded, TimeoutError) as e:
+            if isinstance(e, TimeoutError) and not timeout.expired():
+                raise
+            DeadlineMiddleware.exceeded += 1
+            if started:
+                raise
+            await self._send_timeout(send)
+        finally:
+            _deadline.reset(token)
+
+    @staticmethod
+    async def _send_timeout(send):
+        body = json.dumps({"detail": "Request deadline exceeded"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 504,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {"exceeded": cls.exceeded}
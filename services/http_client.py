@@ -0,0 +1,73 @@
+"""
+Shared HTTP client for outbound API calls (Supabase, LRCLIB, Spotify).
+
+A single pooled ``httpx.AsyncClient`` is opened in the FastAPI lifespan and
+reused by every service so connections stay alive between requests instead of
+paying a new TCP/TLS handshake per call.
+"""
+from typing import Any, Dict, Optional
+from httpx import AsyncClient, Limits, Timeout
+
+from config import settings
+
+
+class HTTPClientManager:
+    """Owns the process-wide pooled AsyncClient."""
+
+    def __init__(self):
+        self._client: Optional[AsyncClient] = None
+
+    def _build_client(self) -> AsyncClient:
+        limits = Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry_seconds,
+        )
+        timeout = Timeout(
+            settings.http_timeout_seconds,
+            connect=settings.http_connect_timeout_seconds,
+            pool=settings.http_pool_timeout_seconds,
+        )
+        return AsyncClient(http2=settings.http2_enabled, limits=limits, timeout=timeout)
+
+    async def start(self) -> AsyncClient:
+        """Open the shared client. Called from the app lifespan."""
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+
+    async def close(self):
+        """Close the shared client and release pooled connections."""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    @property
+    def client(self) -> AsyncClient:
+        """Get the shared client, opening it lazily outside the app lifespan."""
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Get connection pool occupancy; empty until the client is opened."""
+        # httpx does not expose its pool; read httpcore's directly and tolerate changes
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        if pool is None:
+            return {}
+        try:
+            connections = pool.connections
+            queued = [request.is_queued() for request in pool._requests]
+        except AttributeError:
+            return {}
+        return {
+            "connections": len(connections),
+            "idle_connections": sum(1 for connection in connections if connection.is_idle()),
+            "active_requests": queued.count(False),
+            "queued_requests": queued.count(True),
+            "max_connections": settings.http_max_connections,
+        }
+
+
+# Create global instance
+http_client = HTTPClientManager()
@@ -0,0 +1,71 @@
+"""
+Parser for LRC synced lyrics.
+
+Turns the `synced_lyrics` text stored on a lyrics row into timed lyric
+lines: each line's start comes from its timestamp and its end from the
+next timestamp in the file.
+"""
+import re
+from typing import List, Optional, Tuple
+
+from models import LyricLineCreate
+
+# [mm:ss], [mm:ss.xx] or [mm:ss:xx]
+_TIMESTAMP = re.compile(r"\[(\d{1,3}):(\d{1,2})(?:[.:](\d{1,3}))?\]")
+_OFFSET_TAG = re.compile(r"\[offset:\s*([+-]?\d+)\s*\]", re.IGNORECASE)
+# Word-level timestamps from enhanced LRC, e.g. <00:12.34>
+_WORD_TIMESTAMP = re.compile(r"<\d{1,3}:\d{1,2}(?:[.:]\d{1,3})?>")
+
+
+def _timestamp_ms(minutes: str, seconds: str, fraction: Optional[str]) -> int:
+    ms = int(minutes) * 60_000 + int(seconds) * 1000
+    if fraction:
+        ms += int(fraction.ljust(3, "0")[:3])
+    return ms
+
+
+def parse_lrc(synced_lyrics: str, lyrics_id: int) -> List[LyricLineCreate]:
+    """
+    Parse LRC text into lyric lines ordered by start time.
+
+    Lines with several timestamps (repeated choruses) produce one lyric line
+    per timestamp. Timestamped blank lines are not returned but still end the
+    line before them; the last line has no end time.
+    """
+    offset_ms = 0
+    offset_match = _OFFSET_TAG.search(synced_lyrics)
+    if offset_match:
+        offset_ms = int(offset_match.group(1))
+
+    entries: List[Tuple[int, str]] = []
+    for raw_line in synced_lyrics.splitlines():
+        line = raw_line.strip()
+        pos = 0
+        times = []
+        while True:
+            match = _TIMESTAMP.match(line, pos)
+            if match is None:
+                break
+            times.append(max(_timestamp_ms(*match.groups()) - offset_ms, 0))
+            pos = match.end()
+        if not times:
+            continue
+
+        text = _WORD_TIMESTAMP.sub("", line[pos:]).strip()
+        entries.extend((start, text) for start in times)
+
+    # Stable sort keeps file order for lines sharing a timestamp
+    entries.sort(key=lambda entry: entry[0])
+
+    lines = []
+    for index, (start, text) in enumerate(entries):
+        if not text:
+            continue
+        end = entries[index + 1][0] if index + 1 < len(entries) else None
+        lines.append(LyricLineCreate(
+            lyrics_id=lyrics_id,
+            start_time_ms=start,
+            end_time_ms=end,
+            text_content=text
+        ))
+    return lines
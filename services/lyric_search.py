@@ -0,0 +1,131 @@
+"""
+Full-text search over lyric line content.
+
+Every `lyric_lines.text_content` is held in a character-bigram inverted
+index (see services.text_index), so learners can find the songs containing
+a phrase they heard without scanning the lyrics tables upstream.
+
+The ranked hits of a query are computed once (up to `lyric_search_max_hits`)
+and cached, so paging through them does not rescore every matching line.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from config import settings
+from services.cache import TTLCache
+from services.supabase_service import supabase_service
+from services.text_index import LiveIndex, NGramIndex, normalize_text, tokenize
+
+
+class LyricSearchIndex(LiveIndex):
+    """Bigram index over lyric lines, keyed by line ID."""
+
+    name = "lyric search index"
+
+    def __init__(self):
+        super().__init__()
+        self._index = NGramIndex(n=2, min_n=2)
+        # line ID -> (lyrics ID, start time)
+        self._lines: Dict[int, Tuple[int, Optional[int]]] = {}
+        self._lines_by_lyrics: Dict[int, Set[int]] = {}
+        # Normalized query -> ranked (line ID, score) pairs
+        self._results = TTLCache(
+            max_entries=settings.lyric_search_cache_max_entries,
+            ttl_seconds=settings.lyric_search_cache_ttl_seconds
+        )
+        self.searches = 0
+
+    def upsert_lines(self, lines: Iterable[Dict[str, Any]]):
+        lines = list(lines)
+        self._record("upsert_lines", lines)
+        self._results.clear()
+        for line in lines:
+            if not line.get("text_content") or line.get("lyrics_id") is None:
+                continue
+            self._index.add(line["id"], line["text_content"])
+            self._lines[line["id"]] = (line["lyrics_id"], line.get("start_time_ms"))
+            self._lines_by_lyrics.setdefault(line["lyrics_id"], set()).add(line["id"])
+
+    def remove_lyrics(self, lyrics_id: int):
+        """Drop every line belonging to a lyrics record."""
+        self._record("remove_lyrics", lyrics_id)
+        self._results.clear()
+        for line_id in self._lines_by_lyrics.pop(lyrics_id, ()):
+            self._index.remove(line_id)
+            self._lines.pop(line_id, None)
+
+    def remove_lines(self, line_ids: Iterable[int]):
+        """Drop individual lines, e.g. the ones replaced when lyrics are re-parsed."""
+        line_ids = list(line_ids)
+        self._record("remove_lines", line_ids)
+        self._results.clear()
+        for line_id in line_ids:
+            entry = self._lines.pop(line_id, None)
+            if entry is None:
+                continue
+            self._index.remove(line_id)
+            siblings = self._lines_by_lyrics.get(entry[0])
+            if siblings is not None:
+                siblings.discard(line_id)
+                if not siblings:
+                    del self._lines_by_lyrics[entry[0]]
+
+    def _ranked(self, query: str) -> List[Tuple[int, float]]:
+        normalized = normalize_text(query).strip()
+        ranked = self._results.get(normalized)
+        if ranked is not None:
+            return ranked
+
+        tokens = tokenize(normalized)
+        ranked = []
+        for line_id, score in self._index.search(query, min_coverage=1.0):
+            text = self._index.text(line_id)
+            if all(token in text for token in tokens):
+                ranked.append((line_id, score))
+                if len(ranked) >= settings.lyric_search_max_hits:
+                    break
+        self._results.set(normalized, ranked)
+        return ranked
+
+    def search(self, query: str, skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Return a page of the lines containing all words of `query`, best match first.
+
+        Lines containing the query as one contiguous phrase rank above lines
+        that only contain each of its words.
+        """
+        self.searches += 1
+        hits = []
+        for line_id, score in self._ranked(query)[skip:skip + limit]:
+            lyrics_id, start_time_ms = self._lines[line_id]
+            hits.append({
+                "lyrics_id": lyrics_id,
+                "line_id": line_id,
+                "start_time_ms": start_time_ms,
+                "score": round(score, 3),
+            })
+        return hits
+
+    async def _load(self) -> "LyricSearchIndex":
+        fresh = LyricSearchIndex()
+        async for line in supabase_service.scan("lyric_lines"):
+            fresh.upsert_lines((line,))
+        return fresh
+
+    def _adopt(self, fresh: "LyricSearchIndex"):
+        self._index = fresh._index
+        self._lines = fresh._lines
+        self._lines_by_lyrics = fresh._lines_by_lyrics
+        self._results.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "lyrics": len(self._lines_by_lyrics),
+            "searches": self.searches,
+            "cached_queries": len(self._results),
+            **self._index.stats(),
+        }
+
+
+# Create global instance
+lyric_search_index = LyricSearchIndex()
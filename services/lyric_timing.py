@@ -0,0 +1,97 @@
+"""
+Playback-position lookups over lyric line timings.
+
+Each lyrics ID gets a sorted, array-backed index of its line start/end
+times, built once from `lyric_lines` and answered by binary search.
+"""
+import asyncio
+from array import array
+from bisect import bisect_right
+from typing import Any, Dict, List, Optional
+
+from config import settings
+from services.cache import TTLCache
+from services.deadline import detached_context
+from services.supabase_service import supabase_service
+
+
+class LyricTimingIndex:
+    """Start/end times of one lyrics' lines, sorted by start time."""
+
+    def __init__(self, lines: List[Dict[str, Any]]):
+        timed = sorted(
+            (line for line in lines if line.get("start_time_ms") is not None),
+            key=lambda line: (line["start_time_ms"], line["id"])
+        )
+        self.lines = timed
+        self.starts = array("q", (line["start_time_ms"] for line in timed))
+        # Lines without an end time last until the next line starts; -1 means open-ended
+        self.ends = array("q")
+        for i, line in enumerate(timed):
+            end = line.get("end_time_ms")
+            if end is None:
+                end = timed[i + 1]["start_time_ms"] if i + 1 < len(timed) else -1
+            self.ends.append(end)
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def line_at(self, t_ms: int) -> Optional[Dict[str, Any]]:
+        """Get the line playing at `t_ms`, or None between or outside lines."""
+        i = bisect_right(self.starts, t_ms) - 1
+        if i < 0:
+            return None
+        end = self.ends[i]
+        if end >= 0 and t_ms >= end:
+            return None
+        return self.lines[i]
+
+
+class LyricTimingIndexCache:
+    """Caches one LyricTimingIndex per lyrics ID, invalidated when lines change."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self._indexes = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        # Invalidation unregisters a build, so builds started before a write are not stored
+        self._builds: Dict[int, asyncio.Task] = {}
+
+    async def _build(self, lyrics_id: int) -> LyricTimingIndex:
+        lines = await supabase_service.get_all("lyric_lines", {"lyrics_id": lyrics_id})
+        index = LyricTimingIndex(lines)
+        if self._builds.get(lyrics_id) is asyncio.current_task():
+            self._indexes.set(lyrics_id, index)
+        return index
+
+    async def get(self, lyrics_id: int) -> LyricTimingIndex:
+        """Get the index for a lyrics ID, building it once for concurrent callers."""
+        index = self._indexes.get(lyrics_id)
+        if index is not None:
+            return index
+
+        task = self._builds.get(lyrics_id)
+        if task is None:
+            # Shared by concurrent callers, so it must not inherit the first caller's deadline
+            task = asyncio.create_task(self._build(lyrics_id), context=detached_context())
+            self._builds[lyrics_id] = task
+
+            def _done(finished: asyncio.Task):
+                if self._builds.get(lyrics_id) is finished:
+                    del self._builds[lyrics_id]
+
+            task.add_done_callback(_done)
+        return await asyncio.shield(task)
+
+    def invalidate(self, lyrics_id: int):
+        """Drop the index for a lyrics ID after its lines were written."""
+        self._indexes.invalidate(lyrics_id)
+        self._builds.pop(lyrics_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._indexes.stats()
+
+
+# Create global instance
+lyric_timing_indexes = LyricTimingIndexCache(
+    max_entries=settings.lyric_timing_cache_max_entries,
+    ttl_seconds=settings.lyric_timing_cache_ttl_seconds
+)
@@ -0,0 +1,264 @@
+"""
+Prometheus metrics with a small in-process registry.
+
+Counters and histograms are dicts keyed by label values, so recording one
+costs a dict lookup and a bisect. Values that mirror other services' state
+(connection pool, caches, breakers) are read by collectors only when
+`/metrics` is scraped, so they add nothing to the request path.
+"""
+import asyncio
+import bisect
+import contextvars
+import math
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from config import settings
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Upstream calls made on behalf of the current request, None outside a request
+_upstream_calls: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar("upstream_calls", default=None)
+
+Sample = Tuple[Dict[str, Any], float]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+def render_family(name: str, help_text: str, metric_type: str, samples: Iterable[Sample]) -> List[str]:
+    """Render one metric family in the Prometheus text format."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+    return lines
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        samples = [(dict(zip(self.labelnames, labels)), value) for labels, value in self._values.items()]
+        return render_family(self.name, self.help_text, "counter", samples)
+
+
+class Histogram:
+    """Fixed-bucket histogram with optional labels."""
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in self._series.items():
+            base = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels({**base, 'le': _format_value(float(bound))})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(base)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(base)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Metrics recorded in-process plus collectors that are read at scrape time."""
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], List[str]]):
+        """Register a callable returning rendered metric families, run on every scrape."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+# Create global instance
+registry = MetricsRegistry()
+
+request_duration = registry.histogram(
+    "ekubo_http_request_duration_seconds",
+    "Time to handle an HTTP request, by route template.",
+    ("method", "route", "status")
+)
+request_upstream_calls = registry.histogram(
+    "ekubo_http_request_upstream_calls",
+    "Upstream calls (Supabase, LRCLIB, Spotify) made while handling one request.",
+    ("route",),
+    COUNT_BUCKETS
+)
+upstream_duration = registry.histogram(
+    "ekubo_upstream_request_duration_seconds",
+    "Time of one outbound call attempt, by target and operation.",
+    ("target", "operation")
+)
+upstream_errors = registry.counter(
+    "ekubo_upstream_errors_total",
+    "Outbound call attempts that raised, by target and operation.",
+    ("target", "operation")
+)
+event_loop_lag = registry.histogram(
+    "ekubo_event_loop_lag_seconds",
+    "How late the event loop woke a periodic timer.",
+    buckets=LAG_BUCKETS
+)
+
+
+@contextmanager
+def observe_upstream(target: str, operation: str) -> Iterator[None]:
+    """Time one outbound call and count it against the current request."""
+    calls = _upstream_calls.get()
+    if calls is not None:
+        calls[0] += 1
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        upstream_errors.inc(target, operation)
+        raise
+    finally:
+        upstream_duration.observe(time.perf_counter() - started, target, operation)
+
+
+def _route_label(scope: Dict[str, Any]) -> str:
+    """Get the route template of a handled request (e.g. /api/songs/{song_id}) to bound label cardinality."""
+    route = scope.get("route")
+    path_format = getattr(route, "path_format", None)
+    if path_format is None:
+        return "unmatched"
+    # Routes of included routers may carry only their own part of the template (e.g. /{song_id});
+    # the segments in front of it are the literal router prefixes, taken from the request path
+    template = path_format.split("/")[1:]
+    path = scope["path"].split("/")[1:]
+    prefix = path[:max(0, len(path) - len(template))]
+    return "/" + "/".join(prefix + template)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency and upstream call counts per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: Dict[str, Any]):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        calls = [0]
+        token = _upstream_calls.set(calls)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _upstream_calls.reset(token)
+            route = _route_label(scope)
+            request_duration.observe(time.perf_counter() - started, scope["method"], route, str(status))
+            request_upstream_calls.observe(calls[0], route)
+
+
+class LoopLagMonitor:
+    """Periodically measures how late the event loop runs a timer."""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self.last_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval_seconds)
+            self.last_lag = max(0.0, time.monotonic() - started - self.interval_seconds)
+            event_loop_lag.observe(self.last_lag)
+
+    def start(self):
+        """Start measuring. Called from the app lifespan."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+# Create global instance
+loop_lag_monitor = LoopLagMonitor(settings.metrics_loop_lag_interval_ms / 1000)
@@ -0,0 +1,65 @@
+"""
+Opaque cursor helpers for keyset pagination.
+
+Cursors are URL-safe base64 encoded JSON so clients treat them as opaque
+tokens, while list endpoints page with `id > last_id` instead of OFFSET.
+Ranked results, which have no stable ID order, use position cursors.
+"""
+import base64
+import binascii
+import json
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: Dict[str, Any]) -> str:
+    """Encode cursor values into an opaque token."""
+    payload = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Decode a token produced by encode_cursor, raising 400 if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, binascii.Error, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, dict):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def cursor_after_id(cursor: Optional[str]) -> Optional[int]:
+    """Get the last seen ID from an ID cursor, or None when no cursor was given."""
+    if cursor is None:
+        return None
+    after_id = decode_cursor(cursor).get("id")
+    if not isinstance(after_id, int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return after_id
+
+
+def cursor_offset(cursor: Optional[str]) -> int:
+    """Get the position from a ranked-results cursor, or 0 when no cursor was given."""
+    if cursor is None:
+        return 0
+    offset = decode_cursor(cursor).get("offset")
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return offset
+
+
+def set_next_offset_cursor(response: Response, next_offset: int, has_more: bool):
+    """Set the next-page cursor header for ranked results when more remain."""
+    if has_more:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"offset": next_offset})
+
+
+def set_next_cursor(response: Response, rows: List[Dict[str, Any]], limit: int):
+    """Set the next-page cursor header when a full page was returned."""
+    if rows and len(rows) >= limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"id": rows[-1]["id"]})
@@ -0,0 +1,123 @@
+"""
+Raw passthrough of PostgREST list results.
+
+For flat response models whose fields are all table columns, PostgREST can
+be asked for exactly those columns (`select=`) and its JSON array returned
+to the client unchanged, skipping json decode, Pydantic validation and
+re-encoding of every row. Columns are selected with `id` first, so the
+last row of a page starts with the final `{"id":` in the body. Its ID
+(for the next-page cursor) is found without parsing: `{"` cannot appear
+unescaped inside a JSON string.
+"""
+import json
+import typing
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple, Type
+
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+
+from config import settings
+from services.conditional import JSON_MEDIA_TYPE
+from services.pagination import NEXT_CURSOR_HEADER, encode_cursor
+from services.supabase_service import supabase_service
+
+_ROW_START = b'{"id":'
+
+
+def _is_column(annotation: Any) -> bool:
+    """Whether a field annotation is a scalar (possibly Optional) rather than nested data."""
+    for arg in typing.get_args(annotation) or (annotation,):
+        if arg is type(None):
+            continue
+        origin = typing.get_origin(arg) or arg
+        if isinstance(origin, type) and issubclass(origin, (BaseModel, list, dict, tuple, set)):
+            return False
+    return True
+
+
+@lru_cache(maxsize=None)
+def model_columns(model: Type[BaseModel]) -> Tuple[str, ...]:
+    """The scalar (column) fields of a model, `id` first."""
+    names = [name for name, field in model.model_fields.items() if _is_column(field.annotation)]
+    return tuple(["id"] + [name for name in names if name != "id"]) if "id" in names else tuple(names)
+
+
+@lru_cache(maxsize=None)
+def passthrough_select(model: Type[BaseModel]) -> Optional[str]:
+    """The `select=` that makes PostgREST rows match `model`, or None if the model has nested fields."""
+    columns = model_columns(model)
+    if "id" not in columns or len(columns) != len(model.model_fields):
+        return None
+    return ",".join(columns)
+
+
+def page_info(body: bytes) -> Tuple[int, Optional[int]]:
+    """Count the rows of a passthrough page and read the last row's ID."""
+    count = body.count(_ROW_START)
+    if not count:
+        if body.strip() in (b"", b"[]"):
+            return 0, None
+        # Not PostgREST's compact formatting; fall back to parsing
+        rows = json.loads(body)
+        return len(rows), rows[-1]["id"] if rows else None
+    start = body.rfind(_ROW_START) + len(_ROW_START)
+    end = start
+    while body[end:end + 1].isdigit():
+        end += 1
+    return count, int(body[start:end])
+
+
+def can_pass_through(model: Type[BaseModel]) -> bool:
+    return settings.list_passthrough_enabled and passthrough_select(model) is not None
+
+
+def projection_select(fields: str, model: Type[BaseModel]) -> str:
+    """
+    Turn a comma-separated `fields=` parameter into a `select=` for `model`.
+
+    Only column fields of the model are allowed; `id` is always included
+    (first) so rows stay addressable and cursors keep working.
+    """
+    allowed = model_columns(model)
+    requested = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in requested if field not in allowed]
+    if not requested or unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid fields {', '.join(unknown) or fields!r}; allowed: {', '.join(allowed)}"
+        )
+    return ",".join(["id"] + [field for field in requested if field != "id"])
+
+
+def list_select(
+    model: Type[BaseModel],
+    fields: Optional[str] = None,
+    summary_model: Optional[Type[BaseModel]] = None,
+    view: str = "full"
+) -> Optional[str]:
+    """The `select=` for a list request's `fields=` / `view=summary`, or None for full rows."""
+    if fields:
+        return projection_select(fields, model)
+    if view == "summary" and summary_model is not None:
+        return passthrough_select(summary_model)
+    return None
+
+
+async def passthrough_page(
+    table: str,
+    select: str,
+    skip: int = 0,
+    limit: int = 100,
+    filters: Optional[Dict[str, Any]] = None,
+    after_id: Optional[int] = None
+) -> Response:
+    """Fetch one page of `select` columns as raw PostgREST bytes, setting the next-page cursor."""
+    body = await supabase_service.get_multi_raw(
+        table, select, skip=skip, limit=limit, filters=filters, after_id=after_id
+    )
+    response = Response(content=body, media_type=JSON_MEDIA_TYPE)
+    count, last_id = page_info(body)
+    if count >= limit and last_id is not None:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"id": last_id})
+    return response
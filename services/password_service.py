@@ -0,0 +1,101 @@
+"""
+Password hashing on a bounded worker pool.
+
+bcrypt is deliberately slow, so hashing and verification run on a
+dedicated thread pool instead of the event loop. Admission control caps
+how much auth work may queue; beyond that, requests are shed with 503.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+import bcrypt
+from fastapi import HTTPException
+
+from config import settings
+
+
+class PasswordHasher:
+    """Runs bcrypt on a size-limited thread pool with a bounded queue."""
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self._admitted >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Authentication service is busy, please retry.",
+                headers={"Retry-After": "1"}
+            )
+
+        submitted_at = time.perf_counter()
+
+        def job():
+            wait = time.perf_counter() - submitted_at
+            with self._lock:
+                self._running += 1
+            try:
+                return wait, func(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+        def _release(_future):
+            with self._lock:
+                self._admitted -= 1
+
+        with self._lock:
+            self._admitted += 1
+        future = self._executor.submit(job)
+        # Freed when the job finishes or is cancelled before it starts, not when the caller
+        # goes away, so abandoned jobs still count against the queue while they hold a worker
+        future.add_done_callback(_release)
+        wait, result = await asyncio.wrap_future(future)
+
+        self.completed += 1
+        self.total_wait_seconds += wait
+        self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        return result
+
+    async def hash_password(self, password: str) -> str:
+        hashed = await self._run(bcrypt.hashpw, password.encode("utf-8"), bcrypt.gensalt())
+        return hashed.decode("utf-8")
+
+    async def verify_password(self, password: str, hashed_password: str) -> bool:
+        return await self._run(bcrypt.checkpw, password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": self._running,
+            "queued": max(self._admitted - self._running, 0),
+            "saturation": self._running / self.max_workers,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": (self.total_wait_seconds / self.completed * 1000) if self.completed else 0.0,
+            "max_wait_ms": self.max_wait_seconds * 1000,
+        }
+
+
+# Create global instance
+password_hasher = PasswordHasher(
+    max_workers=settings.password_hash_workers,
+    max_queue=settings.password_hash_max_queue
+)
@@ -0,0 +1,227 @@
+"""
+Buffered batch writer for practice progress events.
+
+Clients send one progress event per lyric line. Events are collected in
+memory and written to Supabase as bulk array inserts once the buffer
+reaches a size threshold or the flush interval elapses, so a practice
+session costs a handful of writes instead of hundreds.
+
+A batch Supabase rejects as invalid (400/409/422) is split in halves until
+the offending rows are isolated; those are dropped and the rest are
+stored. Any other failure (5xx, 408/429, auth or missing-table errors,
+network errors) fails the whole flush and keeps unacknowledged rows
+queued for the next one.
+"""
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from fastapi import HTTPException
+
+from config import settings
+from services.deadline import detached_context
+from services.supabase_service import BULK_INSERT_CHUNK_SIZE, supabase_service
+
+logger = logging.getLogger(__name__)
+
+# Statuses meaning some rows of an insert are invalid, rather than the whole request failing
+ROW_REJECTION_STATUS_CODES = frozenset({400, 409, 422})
+
+
+class _Batch:
+    """Events waiting for the same flush, plus the future durable writers wait on."""
+
+    def __init__(self):
+        self.rows: List[Dict[str, Any]] = []
+        # Rows whose sender did not wait for the write; retried if a flush fails
+        self.unacknowledged: List[Dict[str, Any]] = []
+        self.written: asyncio.Future = asyncio.get_running_loop().create_future()
+        # Rows Supabase rejected, keyed by id(row), with the reason
+        self.dropped: Dict[int, str] = {}
+        # Rows created so far and how many leading rows were stored or dropped
+        self.created: List[Dict[str, Any]] = []
+        self.resolved = 0
+
+
+class ProgressBuffer:
+    """Collects rows for one table and flushes them on size/time thresholds."""
+
+    def __init__(self, table: str, max_batch: int, flush_interval_seconds: float, max_buffered: int):
+        self.table = table
+        self.max_batch = max_batch
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_buffered = max_buffered
+        self._batch: Optional[_Batch] = None
+        self._flush_lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+        self._flush_tasks: Set[asyncio.Task] = set()
+        self._listeners: List[Callable[[List[Dict[str, Any]]], None]] = []
+        self.flushed_batches = 0
+        self.flushed_rows = 0
+        self.failed_flushes = 0
+        self.rejected_rows = 0
+        self.dropped_rows = 0
+
+    @property
+    def buffered(self) -> int:
+        return len(self._batch.rows) if self._batch else 0
+
+    def add_listener(self, listener: Callable[[List[Dict[str, Any]]], None]):
+        """Register a callback given the stored rows (with IDs) after every successful flush."""
+        self._listeners.append(listener)
+
+    def _current_batch(self) -> _Batch:
+        if self._batch is None:
+            self._batch = _Batch()
+        return self._batch
+
+    async def add(self, rows: List[Dict[str, Any]], wait: bool = True) -> int:
+        """
+        Buffer rows for the next flush.
+
+        With `wait`, returns only after the batch holding the rows was written
+        (durable acknowledgement); otherwise returns once they are buffered.
+        """
+        if self.buffered + len(rows) > self.max_buffered:
+            self.rejected_rows += len(rows)
+            raise HTTPException(
+                status_code=503,
+                detail="Progress buffer is full, please retry.",
+                headers={"Retry-After": "1"}
+            )
+
+        batch = self._current_batch()
+        batch.rows.extend(rows)
+        if not wait:
+            batch.unacknowledged.extend(rows)
+        if len(batch.rows) >= self.max_batch:
+            self._schedule_flush()
+
+        if wait:
+            # Shielded so a disconnecting client does not cancel the shared batch
+            await asyncio.shield(batch.written)
+            reasons = [batch.dropped[id(row)] for row in rows if id(row) in batch.dropped]
+            if reasons:
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"{len(reasons)} of {len(rows)} progress events were rejected: {reasons[0]}"
+                )
+        return len(rows)
+
+    def _schedule_flush(self) -> asyncio.Task:
+        # The batch is shared by many requests, so the flush must not inherit this one's deadline
+        task = asyncio.create_task(self.flush(), context=detached_context())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+        return task
+
+    async def flush_detached(self):
+        """Flush from a request handler; the flush finishes even if the request times out or disconnects."""
+        await asyncio.shield(self._schedule_flush())
+
+    async def flush(self):
+        """Write everything buffered so far as bulk inserts."""
+        batch, self._batch = self._batch, None
+        if batch is None or not batch.rows:
+            return
+
+        async with self._flush_lock:
+            try:
+                for i in range(0, len(batch.rows), BULK_INSERT_CHUNK_SIZE):
+                    await self._store(batch, batch.rows[i:i + BULK_INSERT_CHUNK_SIZE])
+            except Exception as e:
+                self.failed_flushes += 1
+                logger.warning("Failed to flush %d %s rows: %s", len(batch.rows) - batch.resolved, self.table, e)
+                self._notify(batch.created)
+                if not batch.written.done():
+                    batch.written.set_exception(
+                        HTTPException(status_code=503, detail=f"Failed to store progress: {str(e)}")
+                    )
+                    # Nobody else may await it; avoid "exception was never retrieved" noise
+                    batch.written.exception()
+                # Rows the sender was not told about, and that were not stored yet, are retried with the next flush
+                unacknowledged = {id(row) for row in batch.unacknowledged}
+                pending = [row for row in batch.rows[batch.resolved:] if id(row) in unacknowledged]
+                if pending:
+                    retry = self._current_batch()
+                    retry.rows[:0] = pending
+                    retry.unacknowledged[:0] = pending
+                return
+
+            self.flushed_batches += 1
+            self._notify(batch.created)
+            if not batch.written.done():
+                batch.written.set_result(len(batch.rows))
+
+    async def _store(self, batch: _Batch, rows: List[Dict[str, Any]]):
+        """Insert rows, bisecting on row rejections to drop only the rows Supabase refuses."""
+        try:
+            created = await supabase_service.create_many(self.table, rows)
+        except HTTPException as e:
+            if e.status_code not in ROW_REJECTION_STATUS_CODES:
+                raise
+            if len(rows) > 1:
+                middle = len(rows) // 2
+                await self._store(batch, rows[:middle])
+                await self._store(batch, rows[middle:])
+                return
+            self.dropped_rows += 1
+            batch.dropped[id(rows[0])] = str(e.detail)
+            batch.resolved += 1
+            logger.warning("Dropped a %s row rejected by Supabase: %s (%s)", self.table, e.detail, rows[0])
+            return
+
+        batch.created.extend(created)
+        batch.resolved += len(rows)
+        self.flushed_rows += len(created)
+
+    def _notify(self, created: List[Dict[str, Any]]):
+        if not created:
+            return
+        for listener in self._listeners:
+            try:
+                listener(created)
+            except Exception as e:
+                logger.warning("Progress flush listener failed: %s", e)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning("Progress flush failed: %s", e)
+
+    def start(self):
+        """Start the periodic flusher. Called from the app lifespan."""
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic flusher and write whatever is still buffered."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": self.buffered,
+            "max_buffered": self.max_buffered,
+            "flushed_batches": self.flushed_batches,
+            "flushed_rows": self.flushed_rows,
+            "failed_flushes": self.failed_flushes,
+            "rejected_rows": self.rejected_rows,
+            "dropped_rows": self.dropped_rows,
+        }
+
+
+# Create global instance
+progress_buffer = ProgressBuffer(
+    table="user_progress",
+    max_batch=settings.progress_flush_max_events,
+    flush_interval_seconds=settings.progress_flush_interval_ms / 1000,
+    max_buffered=settings.progress_max_buffered_events
+)
@@ -0,0 +1,193 @@
+"""
+Running practice accuracy counters.
+
+Counters per practice session, per user and per (user, matched song) are
+updated incrementally as progress events are written, so stats reads are
+O(1) instead of scans over `user_progress`. A counter is seeded from the
+raw rows the first time it is read; counters live in a bounded LRU with a
+TTL, so evicted or expired ones are simply seeded again on the next read.
+`rebuild` recomputes the loaded counters from scratch to detect drift.
+"""
+import asyncio
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+
+from config import settings
+from services.cache import TTLCache
+from services.progress_buffer import progress_buffer
+from services.supabase_service import supabase_service
+
+SESSION = "session"
+USER = "user"
+USER_SONG = "user_song"
+
+PROGRESS_COLUMNS = "id,user_id,matched_song_id,practice_session_id,is_correct"
+REBUILD_PAGE_SIZE = 1000
+MAX_REPORTED_DRIFT = 100
+
+CounterKey = Tuple[str, Any]
+
+
+def _counter_keys(row: Dict[str, Any]) -> List[CounterKey]:
+    keys = []
+    if row.get("practice_session_id") is not None:
+        keys.append((SESSION, row["practice_session_id"]))
+    if row.get("user_id") is not None:
+        keys.append((USER, row["user_id"]))
+        if row.get("matched_song_id") is not None:
+            keys.append((USER_SONG, (row["user_id"], row["matched_song_id"])))
+    return keys
+
+
+def _filters_for(key: CounterKey) -> Dict[str, Any]:
+    scope, value = key
+    if scope == SESSION:
+        return {"practice_session_id": value}
+    if scope == USER:
+        return {"user_id": value}
+    return {"user_id": value[0], "matched_song_id": value[1]}
+
+
+def _as_stats(counter: List[int]) -> Dict[str, Any]:
+    total, correct = counter
+    return {
+        "total_lines": total,
+        "correct_lines": correct,
+        "accuracy_percentage": round(correct / total * 100, 2) if total else 0.0,
+    }
+
+
+class ProgressAggregates:
+    """In-memory `[total, correct]` counters keyed by (scope, key)."""
+
+    def __init__(self):
+        self._counters = TTLCache(
+            max_entries=settings.progress_stats_max_counters,
+            ttl_seconds=settings.progress_stats_ttl_seconds
+        )
+        # Rows written while a seed or rebuild is reading raw rows, merged in afterwards
+        self._observers: List[List[Dict[str, Any]]] = []
+        # A rebuild scans all of `user_progress`; only one may run at a time
+        self._rebuild_lock = asyncio.Lock()
+
+    def record(self, rows: List[Dict[str, Any]]):
+        """Apply newly stored progress rows to every counter already loaded."""
+        for observed in self._observers:
+            observed.extend(rows)
+        for row in rows:
+            correct = 1 if row.get("is_correct") else 0
+            for key in _counter_keys(row):
+                counter = self._counters.peek(key)
+                if counter is not None:
+                    counter[0] += 1
+                    counter[1] += correct
+
+    async def _read_raw(self, fetch) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Run `fetch` while capturing rows recorded concurrently."""
+        observed: List[Dict[str, Any]] = []
+        self._observers.append(observed)
+        try:
+            rows = await fetch()
+        finally:
+            self._observers.remove(observed)
+        return rows, observed
+
+    async def _seed(self, key: CounterKey) -> List[int]:
+        rows, observed = await self._read_raw(
+            lambda: supabase_service.get_all("user_progress", _filters_for(key), select=PROGRESS_COLUMNS)
+        )
+        seen_ids = {row["id"] for row in rows}
+        counter = [0, 0]
+        for row in rows + [row for row in observed if row.get("id") not in seen_ids]:
+            if key in _counter_keys(row):
+                counter[0] += 1
+                counter[1] += 1 if row.get("is_correct") else 0
+        # A concurrent read may have seeded the same key first
+        existing = self._counters.peek(key)
+        if existing is not None:
+            return existing
+        self._counters.set(key, counter)
+        return counter
+
+    async def get(self, scope: str, value: Any) -> Dict[str, Any]:
+        """Get the stats for one counter, seeding it from raw rows on first use."""
+        key = (scope, value)
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = await self._seed(key)
+        return _as_stats(counter)
+
+    async def _scan_all(self, keys: Set[CounterKey]) -> Tuple[Dict[CounterKey, List[int]], int, Optional[int]]:
+        # Only `keys` are counted, so the scan holds no more counters than the cache does
+        counters: Dict[CounterKey, List[int]] = {key: [0, 0] for key in keys}
+        scanned = 0
+        after_id = None
+        while True:
+            rows = await supabase_service.get_multi(
+                "user_progress", limit=REBUILD_PAGE_SIZE, after_id=after_id, select=PROGRESS_COLUMNS
+            )
+            for row in rows:
+                correct = 1 if row.get("is_correct") else 0
+                for key in _counter_keys(row):
+                    counter = counters.get(key)
+                    if counter is not None:
+                        counter[0] += 1
+                        counter[1] += correct
+            scanned += len(rows)
+            if rows:
+                after_id = rows[-1]["id"]
+            if len(rows) < REBUILD_PAGE_SIZE:
+                return counters, scanned, after_id
+
+    async def rebuild(self) -> Dict[str, Any]:
+        """Recompute the loaded counters from `user_progress`, reporting those that had drifted."""
+        if self._rebuild_lock.locked():
+            raise HTTPException(status_code=409, detail="A progress stats rebuild is already running")
+        async with self._rebuild_lock:
+            return await self._rebuild()
+
+    async def _rebuild(self) -> Dict[str, Any]:
+        keys = set(self._counters.keys())
+        (fresh, scanned, last_id), observed = await self._read_raw(lambda: self._scan_all(keys))
+
+        # Rows stored after the scan passed their position were not seen by it
+        for row in observed:
+            if last_id is None or row.get("id", 0) > last_id:
+                correct = 1 if row.get("is_correct") else 0
+                for key in _counter_keys(row):
+                    counter = fresh.get(key)
+                    if counter is not None:
+                        counter[0] += 1
+                        counter[1] += correct
+
+        drift = []
+        for key, expected in fresh.items():
+            counter = self._counters.peek(key)
+            if counter is None:
+                # Evicted during the scan; it will be seeded again when read
+                continue
+            if counter != expected:
+                drift.append({
+                    "scope": key[0],
+                    "key": str(key[1]),
+                    "expected": _as_stats(expected),
+                    "actual": _as_stats(counter),
+                })
+            # Corrected in place so callers holding the list see the new values
+            counter[:] = expected
+
+        return {
+            "rows_scanned": scanned,
+            "counters": len(fresh),
+            "drift_count": len(drift),
+            "drift": drift[:MAX_REPORTED_DRIFT],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {"counters": len(self._counters), **self._counters.stats()}
+
+
+# Create global instance
+progress_aggregates = ProgressAggregates()
+progress_buffer.add_listener(progress_aggregates.record)
@@ -0,0 +1,329 @@
+"""
+Tail-latency and failure handling for upstream calls.
+
+`ResiliencePolicy` wraps a single upstream call with:
+
+* adaptive timeouts derived from a percentile of recently observed latency,
+  tracked separately per call class (e.g. single-row reads vs. bulk pages)
+  so slow bulk calls are not judged by the latency of fast lookups,
+* hedging: idempotent calls slower than the hedge percentile get a second
+  attempt and the first successful reply wins,
+* retries with full-jitter exponential backoff for transient errors,
+* a circuit breaker that fails fast while the upstream keeps failing.
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+
+import httpx
+from fastapi import HTTPException
+
+from services.deadline import remaining_budget
+
+T = TypeVar("T")
+
+# Upstream statuses worth retrying; other errors are returned to the caller as-is
+RETRYABLE_STATUS_CODES = frozenset({502, 503, 504})
+
+
+class CircuitOpenError(HTTPException):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(
+            status_code=503,
+            detail=f"{name} is unavailable, please retry.",
+            headers={"Retry-After": str(max(1, round(retry_after)))}
+        )
+
+
+class LatencyTracker:
+    """Sliding window of recent latencies with cheap percentile lookups."""
+
+    def __init__(self, window: int, resort_every: int = 32):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._sorted: List[float] = []
+        self._resort_every = resort_every
+        self._unsorted = 0
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+        self._unsorted += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Get the `q`th percentile (0-100) of the window, or None when empty."""
+        if not self._samples:
+            return None
+        # Re-sorting the whole window on every lookup would cost more than the call it guards
+        if self._unsorted >= self._resort_every or not self._sorted:
+            self._sorted = sorted(self._samples)
+            self._unsorted = 0
+        index = min(len(self._sorted) - 1, int(len(self._sorted) * q / 100))
+        return self._sorted[index]
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; lets one probe through after `reset_seconds`."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.trips = 0
+        self.rejected = 0
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + self.reset_seconds - time.monotonic())
+
+    def allow(self) -> bool:
+        """Check whether a call may go out now."""
+        if self.state == self.OPEN:
+            if self.retry_after() > 0:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                self.rejected += 1
+                return False
+            self._probing = True
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self._failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self._failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def release(self):
+        """Forget an abandoned (cancelled) probe so another one may go out."""
+        self._probing = False
+
+
+class ResiliencePolicy:
+    """Adaptive timeouts, hedging, retries and a circuit breaker for one upstream."""
+
+    def __init__(
+        self,
+        name: str,
+        default_timeout: float,
+        min_timeout: float,
+        timeout_percentile: float,
+        timeout_multiplier: float,
+        hedge_enabled: bool,
+        hedge_percentile: float,
+        hedge_min_delay: float,
+        hedge_max_ratio: float,
+        max_retries: int,
+        retry_base_delay: float,
+        retry_max_delay: float,
+        breaker_failure_threshold: int,
+        breaker_reset_seconds: float,
+        latency_window: int,
+        min_samples: int
+    ):
+        self.name = name
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.timeout_percentile = timeout_percentile
+        self.timeout_multiplier = timeout_multiplier
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_ratio = hedge_max_ratio
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.min_samples = min_samples
+        self.latency_window = latency_window
+        # Call class (e.g. "GET songs one") -> its recent latencies
+        self._latency: Dict[str, LatencyTracker] = {}
+        self.breaker = CircuitBreaker(breaker_failure_threshold, breaker_reset_seconds)
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.retries = 0
+        self.timeouts = 0
+
+    def latency(self, key: str = "default") -> LatencyTracker:
+        """Get the latency window of a call class."""
+        tracker = self._latency.get(key)
+        if tracker is None:
+            tracker = self._latency[key] = LatencyTracker(self.latency_window)
+        return tracker
+
+    def timeout(self, key: str = "default") -> float:
+        """Get the per-attempt timeout of a call class, a multiple of its observed tail latency."""
+        latency = self.latency(key)
+        if len(latency) < self.min_samples:
+            return self.default_timeout
+        tail = latency.percentile(self.timeout_percentile)
+        return min(self.default_timeout, max(self.min_timeout, tail * self.timeout_multiplier))
+
+    def hedge_delay(self, key: str = "default") -> Optional[float]:
+        """Get how long to wait before hedging a call class, or None when hedging is off or unwarranted."""
+        latency = self.latency(key)
+        if not self.hedge_enabled or len(latency) < self.min_samples:
+            return None
+        return max(self.hedge_min_delay, latency.percentile(self.hedge_percentile))
+
+    def _may_hedge(self) -> bool:
+        # Hedges are capped to a share of calls so a slow upstream is not hit twice as hard
+        return self.breaker.state == CircuitBreaker.CLOSED and self.hedges < self.hedge_max_ratio * self.calls
+
+    @staticmethod
+    def is_failure(error: BaseException) -> bool:
+        """Whether an error says the upstream itself is unhealthy (vs. a bad request)."""
+        if isinstance(error, httpx.TransportError):
+            return True
+        return isinstance(error, HTTPException) and error.status_code >= 500
+
+    @staticmethod
+    def is_retryable(error: BaseException) -> bool:
+        if isinstance(error, CircuitOpenError):
+            return False
+        if isinstance(error, httpx.TransportError):
+            return True
+        return isinstance(error, HTTPException) and error.status_code in RETRYABLE_STATUS_CODES
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter keeps retrying clients from synchronising into bursts
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+
+    def _admit(self):
+        if not self.breaker.allow():
+            raise CircuitOpenError(self.name, self.breaker.retry_after())
+
+    async def _attempt(self, fn: Callable[[float], Awaitable[T]], timeout: float, latency: LatencyTracker) -> T:
+        started = time.monotonic()
+        try:
+            result = await fn(timeout)
+        except Exception as e:
+            if isinstance(e, httpx.TimeoutException):
+                self.timeouts += 1
+            if self.is_failure(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        except BaseException:
+            # Cancelled or out of request budget: says nothing about the upstream's health
+            self.breaker.release()
+            raise
+        latency.add(time.monotonic() - started)
+        self.breaker.record_success()
+        return result
+
+    async def _hedged(self, fn: Callable[[float], Awaitable[T]], key: str, hedge: bool) -> T:
+        timeout = self.timeout(key)
+        latency = self.latency(key)
+        delay = self.hedge_delay(key) if hedge else None
+        if delay is None:
+            return await self._attempt(fn, timeout, latency)
+
+        attempts = [asyncio.ensure_future(self._attempt(fn, timeout, latency))]
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if done or not self._may_hedge():
+                return await attempts[0]
+
+            self.hedges += 1
+            attempts.append(asyncio.ensure_future(self._attempt(fn, timeout, latency)))
+            pending = set(attempts)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        if attempt is attempts[1]:
+                            self.hedge_wins += 1
+                        return attempt.result()
+                    error = attempt.exception()
+            raise error
+        finally:
+            for attempt in attempts:
+                if not attempt.done():
+                    attempt.cancel()
+
+    async def call(
+        self,
+        fn: Callable[[float], Awaitable[T]],
+        idempotent: bool = True,
+        key: str = "default",
+        hedge: bool = True
+    ) -> T:
+        """
+        Run `fn(timeout)` under the policy, with the latency stats of call class `key`.
+
+        Only idempotent calls are retried, and only those with `hedge` are
+        hedged; non-idempotent calls just get the default timeout and the
+        circuit breaker.
+        """
+        self.calls += 1
+        if not idempotent:
+            self._admit()
+            return await self._attempt(fn, self.default_timeout, self.latency(key))
+
+        attempt = 0
+        while True:
+            self._admit()
+            try:
+                return await self._hedged(fn, key, hedge)
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_retryable(e):
+                    raise
+                attempt += 1
+                backoff = self._backoff(attempt)
+                left = remaining_budget()
+                if left is not None and left <= backoff:
+                    # The retry could not finish within the request's budget
+                    raise
+                self.retries += 1
+                await asyncio.sleep(backoff)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "latency": {
+                key: {
+                    "samples": len(latency),
+                    "p50_ms": _ms(latency.percentile(50)),
+                    "p95_ms": _ms(latency.percentile(95)),
+                    "p99_ms": _ms(latency.percentile(99)),
+                    "timeout_ms": _ms(self.timeout(key)),
+                    "hedge_delay_ms": _ms(self.hedge_delay(key)),
+                }
+                for key, latency in list(self._latency.items())
+            },
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "breaker_state": self.breaker.state,
+            "breaker_trips": self.breaker.trips,
+            "breaker_rejected": self.breaker.rejected,
+        }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 2) if seconds is not None else None
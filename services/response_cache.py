@@ -0,0 +1,145 @@
+"""
+Cache of final, pre-compressed response bodies.
+
+Hot payloads (lyrics with all their lines) are serialized once and stored
+in every supported content coding, so a cache hit only picks the encoding
+the client accepts and writes the stored bytes. Brotli is used when the
+`brotli` package is installed; otherwise gzip and identity are stored.
+"""
+import asyncio
+import gzip
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+from fastapi import Request, Response
+
+from config import settings
+from services.cache import TaggedTTLCache
+from services.conditional import JSON_MEDIA_TYPE, compute_etag, etag_matches, response_validators
+
+try:
+    import brotli
+except ImportError:  # Optional: pip install brotli
+    brotli = None
+
+IDENTITY = "identity"
+GZIP = "gzip"
+BROTLI = "br"
+
+# Server preference when the client accepts several encodings equally
+ENCODING_PREFERENCE = (BROTLI, GZIP, IDENTITY)
+
+
+def negotiate_encoding(accept_encoding: Optional[str], available: Iterable[str]) -> str:
+    """Pick the best of the `available` content codings for an Accept-Encoding header."""
+    if not accept_encoding:
+        return IDENTITY
+
+    qualities: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[name.strip().lower()] = quality
+
+    wildcard = qualities.get("*")
+    best, best_quality = IDENTITY, 0.0
+    for encoding in ENCODING_PREFERENCE:
+        if encoding not in available:
+            continue
+        quality = qualities.get(encoding)
+        if quality is None:
+            quality = wildcard if wildcard is not None else (1.0 if encoding == IDENTITY else 0.0)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CachedResponse:
+    """One serialized body in several content codings, each with its own ETag."""
+
+    __slots__ = ("bodies", "etags", "size")
+
+    def __init__(self, bodies: Dict[str, bytes]):
+        self.bodies = bodies
+        etag = compute_etag(bodies[IDENTITY])
+        # Encoded variants are different representations, so they get their own strong ETags
+        self.etags = {
+            encoding: etag if encoding == IDENTITY else f'{etag[:-1]}-{encoding}"'
+            for encoding in bodies
+        }
+        self.size = sum(len(body) for body in bodies.values())
+
+    @property
+    def etag(self) -> str:
+        return self.etags[IDENTITY]
+
+    def respond(self, request: Request) -> Response:
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"), self.bodies)
+        etag = self.etags[encoding]
+        headers = {
+            "ETag": etag,
+            "Cache-Control": settings.http_cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            response_validators.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        if encoding != IDENTITY:
+            headers["Content-Encoding"] = encoding
+        return Response(content=self.bodies[encoding], media_type=JSON_MEDIA_TYPE, headers=headers)
+
+
+def _encode(body: bytes) -> Dict[str, bytes]:
+    bodies = {IDENTITY: body}
+    if len(body) >= settings.response_cache_min_compress_bytes:
+        bodies[GZIP] = gzip.compress(body, compresslevel=6)
+        if brotli is not None:
+            bodies[BROTLI] = brotli.compress(body, quality=settings.response_cache_brotli_quality)
+    return bodies
+
+
+class ResponseCache:
+    """Byte-budgeted LRU of CachedResponse entries, invalidated by tag."""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float, max_entries: int):
+        self._entries = TaggedTTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds, max_bytes=max_bytes)
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        return self._entries.get(key)
+
+    async def put(
+        self,
+        key: Hashable,
+        body: bytes,
+        tags: Iterable[str],
+        since: Optional[int] = None
+    ) -> CachedResponse:
+        """
+        Compress a serialized body (off the event loop) and cache every encoding.
+
+        `since` is a `TaggedTTLCache.mark()` taken before the body was loaded.
+        """
+        tags = list(tags)
+        cached = CachedResponse(await asyncio.to_thread(_encode, body))
+        self._entries.set(key, cached, size=cached.size, tags=tags, since=since)
+        response_validators.set(key, cached.etag, tags=tags, since=since)
+        return cached
+
+    def invalidate_tag(self, tag: str):
+        self._entries.invalidate_tag(tag)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._entries.stats(), "brotli": brotli is not None}
+
+
+# Create global instance
+response_cache = ResponseCache(
+    max_bytes=settings.response_cache_max_bytes,
+    ttl_seconds=settings.response_cache_ttl_seconds,
+    max_entries=settings.response_cache_max_entries
+)
@@ -0,0 +1,88 @@
+"""
+Single-flight coalescing of identical concurrent calls.
+
+When many requests ask for the same upstream resource at once (a trending
+song's matched row or lyrics), only the first caller starts the call; the
+others wait on it and share its result or error. The shared call keeps
+running while at least one caller still waits for it and is cancelled
+when the last one goes away.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+from services.deadline import detached_context
+
+T = TypeVar("T")
+
+
+class _Call:
+    """An in-flight call and the number of callers waiting on it."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers share it."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def _start(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> _Call:
+        # The call is shared, so it must not inherit the starting request's deadline;
+        # each waiter is still bounded by its own request's deadline
+        call = _Call(asyncio.create_task(fn(), context=detached_context()))
+        self._calls[key] = call
+        self.calls += 1
+
+        def _done(finished: asyncio.Task):
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            # Errors are delivered to the waiters; avoid "exception was never retrieved"
+            if not finished.cancelled():
+                finished.exception()
+
+        call.task.add_done_callback(_done)
+        return call
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await `fn()`, or the identical call already in flight for `key`."""
+        call = self._calls.get(key)
+        if call is None:
+            call = self._start(key, fn)
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            # Shielded so one disconnecting caller does not cancel the call for the others
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Nobody is left to use the result; stop the upstream call
+                call.task.cancel()
+                self.cancelled += 1
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+
+    def forget(self, predicate: Callable[[Hashable], bool]):
+        """Stop handing out in-flight calls whose key matches, e.g. after a write."""
+        for key in [key for key in self._calls if predicate(key)]:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+        }
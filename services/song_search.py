@@ -0,0 +1,93 @@
+"""
+Local search index over song titles and artists for matched-song lookups.
+
+The index is loaded from Supabase once at startup and then kept current by
+the song and matched-song write endpoints, so title search never needs an
+`ilike` scan upstream. Until the first build finishes, callers fall back
+to the database search.
+"""
+from typing import Any, Dict, List, Set
+
+from services.supabase_service import supabase_service
+from services.text_index import LiveIndex, NGramIndex
+
+
+def _song_text(song: Dict[str, Any]) -> str:
+    # Newline keeps n-grams from spanning the title/artist boundary
+    return f"{song.get('title') or ''}\n{song.get('artist') or ''}"
+
+
+class SongSearchIndex(LiveIndex):
+    """Unigram/bigram index over songs plus the song -> matched ID mapping."""
+
+    name = "song search index"
+
+    def __init__(self):
+        super().__init__()
+        self._index = NGramIndex(n=2, min_n=1)
+        self._matched_by_song: Dict[int, Set[int]] = {}
+        self._song_by_matched: Dict[int, int] = {}
+        self.searches = 0
+
+    def upsert_song(self, song: Dict[str, Any]):
+        self._record("upsert_song", song)
+        self._index.add(song["id"], _song_text(song))
+
+    def remove_song(self, song_id: int):
+        self._record("remove_song", song_id)
+        self._index.remove(song_id)
+
+    def upsert_match(self, match: Dict[str, Any]):
+        self._record("upsert_match", match)
+        self._unlink_match(match["id"])
+        if match.get("song_id") is not None:
+            self._song_by_matched[match["id"]] = match["song_id"]
+            self._matched_by_song.setdefault(match["song_id"], set()).add(match["id"])
+
+    def remove_match(self, matched_id: int):
+        self._record("remove_match", matched_id)
+        self._unlink_match(matched_id)
+
+    def _unlink_match(self, matched_id: int):
+        song_id = self._song_by_matched.pop(matched_id, None)
+        if song_id is not None:
+            matched_ids = self._matched_by_song.get(song_id)
+            if matched_ids is not None:
+                matched_ids.discard(matched_id)
+                if not matched_ids:
+                    del self._matched_by_song[song_id]
+
+    def search(self, query: str, skip: int = 0, limit: int = 100) -> List[int]:
+        """Return matched IDs for the songs best matching `query`, best first."""
+        self.searches += 1
+        matched_ids: List[int] = []
+        for song_id, _ in self._index.search(query):
+            matched_ids.extend(sorted(self._matched_by_song.get(song_id, ())))
+            if len(matched_ids) >= skip + limit:
+                break
+        return matched_ids[skip:skip + limit]
+
+    async def _load(self) -> "SongSearchIndex":
+        fresh = SongSearchIndex()
+        async for song in supabase_service.scan("songs"):
+            fresh.upsert_song(song)
+        async for match in supabase_service.scan("matched"):
+            fresh.upsert_match(match)
+        return fresh
+
+    def _adopt(self, fresh: "SongSearchIndex"):
+        self._index = fresh._index
+        self._matched_by_song = fresh._matched_by_song
+        self._song_by_matched = fresh._song_by_matched
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "matched": len(self._song_by_matched),
+            "searches": self.searches,
+            **self._index.stats(),
+        }
+
+
+# Create global instance
+song_search_index = SongSearchIndex()
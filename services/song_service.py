@@ -1,9 +1,17 @@
+import asyncio
 import os
+import time
+import unicodedata
 
-import httpx
 from dotenv import load_dotenv
 from fastapi import HTTPException
 
+from config import settings
+from services.cache import FRESH, MISS, STALE, SQLiteCacheStore, TTLCache
+from services.deadline import detached_context, request_within_budget
+from services.http_client import http_client
+from services.metrics import observe_upstream
+
 # Load environment variables
 load_dotenv()
 
@@ -12,23 +20,99 @@ SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 
 
+# LRCLIB search results, keyed by normalized query
+lyrics_cache = TTLCache(
+    max_entries=settings.lyrics_cache_max_entries,
+    ttl_seconds=settings.lyrics_cache_ttl_seconds,
+    stale_seconds=settings.lyrics_cache_stale_seconds,
+)
+lyrics_disk_cache = (
+    SQLiteCacheStore(
+        settings.lyrics_cache_path,
+        table="lrclib_search",
+        max_entries=settings.lyrics_cache_disk_max_entries
+    )
+    if settings.lyrics_cache_path else None
+)
+_lyrics_fetches: dict[str, asyncio.Task] = {}
+
+
+def _normalize_lyrics_query(q: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", q).casefold().split())
+
+
+async def _fetch_lyrics_upstream(q: str):
+    params = {"q": q}
+
+    with observe_upstream("lrclib", "search"):
+        response = await request_within_budget(http_client.client, "GET", f"{LRCLIB_API_BASE_URL}/search", params=params)
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail="Failed to fetch data from LRCLIB.",
+        )
+    return response.json()
+
+
+async def _refresh_lyrics(key: str, q: str):
+    results = await _fetch_lyrics_upstream(q)
+    lyrics_cache.set(key, results)
+    if lyrics_disk_cache is not None:
+        await lyrics_disk_cache.set(key, results)
+    return results
+
+
+def _lyrics_fetch_task(key: str, q: str) -> asyncio.Task:
+    """Get the in-flight LRCLIB fetch for a key, starting one if needed."""
+    task = _lyrics_fetches.get(key)
+    if task is None:
+        # Shared by concurrent requests (and refreshes), so not bound to one request's deadline
+        task = asyncio.create_task(_refresh_lyrics(key, q), context=detached_context())
+        _lyrics_fetches[key] = task
+
+        def _done(finished: asyncio.Task):
+            _lyrics_fetches.pop(key, None)
+            # Background refresh errors are dropped; the stale entry keeps being served
+            if not finished.cancelled():
+                finished.exception()
+
+        task.add_done_callback(_done)
+    return task
+
+
 async def fetch_lyrics(q: str | None):
     if not q:
         return None
 
-    params = {"q": q}
+    key = _normalize_lyrics_query(q)
+    status, results = lyrics_cache.lookup(key)
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{LRCLIB_API_BASE_URL}/search", params=params)
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=response.status_code,
-                detail="Failed to fetch data from LRCLIB.",
-            )
-        return response.json()
+    if status == MISS and lyrics_disk_cache is not None:
+        max_age = settings.lyrics_cache_ttl_seconds + settings.lyrics_cache_stale_seconds
+        stored = await lyrics_disk_cache.get(key, max_age)
+        if stored is not None:
+            results, age = stored
+            lyrics_cache.set(key, results, ttl_seconds=settings.lyrics_cache_ttl_seconds - age)
+            status = FRESH if age < settings.lyrics_cache_ttl_seconds else STALE
 
+    if status == FRESH:
+        return results
+    if status == STALE:
+        _lyrics_fetch_task(key, q)
+        return results
 
-async def get_spotify_access_token():
+    # Concurrent misses for the same query share one upstream request
+    return await asyncio.shield(_lyrics_fetch_task(key, q))
+
+
+def lyrics_cache_stats():
+    return {
+        "memory": lyrics_cache.stats(),
+        "disk": lyrics_disk_cache.stats() if lyrics_disk_cache is not None else None,
+    }
+
+
+async def _request_spotify_access_token():
     url = "https://accounts.spotify.com/api/token"
     headers = {
         "Content-Type": "application/x-www-form-urlencoded",
@@ -39,23 +123,147 @@ async def get_spotify_access_token():
         "client_secret": SPOTIFY_CLIENT_SECRET,
     }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, headers=headers, data=data)
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=response.status_code,
-                detail="Failed to get Spotify access token.",
+    with observe_upstream("spotify", "token"):
+        response = await request_within_budget(http_client.client, "POST", url, headers=headers, data=data)
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail="Failed to get Spotify access token.",
+        )
+    return response.json()
+
+
+class SpotifyTokenCache:
+    """Caches the client-credentials token until shortly before it expires.
+
+    Concurrent callers that find the token missing or expired share a single
+    refresh instead of each hitting the token endpoint.
+    """
+
+    def __init__(self, refresh_margin_seconds: float):
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self._access_token: str | None = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _is_valid(self) -> bool:
+        return self._access_token is not None and time.monotonic() < self._expires_at
+
+    def invalidate(self, access_token: str | None = None):
+        """Drop the cached token, optionally only if it is still `access_token`."""
+        if access_token is None or access_token == self._access_token:
+            self._access_token = None
+            self._expires_at = 0.0
+
+    async def get(self) -> str:
+        if self._is_valid():
+            return self._access_token
+
+        async with self._lock:
+            # Another request may have refreshed the token while we waited
+            if self._is_valid():
+                return self._access_token
+
+            token_data = await _request_spotify_access_token()
+            expires_in = float(token_data.get("expires_in", 3600))
+            self._access_token = token_data["access_token"]
+            self._expires_at = time.monotonic() + max(expires_in - self.refresh_margin_seconds, 0.0)
+            return self._access_token
+
+
+spotify_token_cache = SpotifyTokenCache(settings.spotify_token_refresh_margin_seconds)
+
+
+async def get_spotify_access_token():
+    return await spotify_token_cache.get()
+
+
+SPOTIFY_SEARCH_URL = "https://api.spotify.com/v1/search"
+
+
+async def _search_spotify_query(query: str, track_limit: int):
+    """Run one search strategy, returning its tracks or an empty list."""
+    params = {
+        "q": query,
+        "type": "track",
+        "limit": track_limit,
+    }
+
+    async def search(access_token: str):
+        with observe_upstream("spotify", "search"):
+            return await request_within_budget(
+                http_client.client,
+                "GET",
+                SPOTIFY_SEARCH_URL,
+                headers={"Authorization": f"Bearer {access_token}"},
+                params=params
             )
-        return response.json()["access_token"]
+
+    access_token = await get_spotify_access_token()
+    response = await search(access_token)
+    if response.status_code == 401:
+        # Token was revoked or expired early: refresh once and retry
+        spotify_token_cache.invalidate(access_token)
+        access_token = await get_spotify_access_token()
+        response = await search(access_token)
+    if response.status_code == 200:
+        results = response.json()
+        return results.get("tracks", {}).get("items", [])
+    return []
+
+
+async def _search_sequential(search_queries: list[str], track_limit: int):
+    for query in search_queries:
+        tracks = await _search_spotify_query(query, track_limit)
+        if tracks:
+            return tracks
+    # If all searches fail, return empty list
+    return []
+
+
+async def _search_hedged(search_queries: list[str], track_limit: int, hedge_delay: float, max_concurrency: int):
+    """
+    Run the strategies concurrently, returning the same result as the sequential search.
+
+    Each strategy starts once the previous one has come back empty or has been
+    running for `hedge_delay` seconds (0 starts them all at once), with at
+    most `max_concurrency` requests in flight. Results are consumed in priority
+    order, so a lower-priority hit is only used once every higher-priority
+    strategy came back empty; whatever is still running is then cancelled.
+    """
+    semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+    started = [asyncio.Event() for _ in search_queries]
+    came_back_empty = [asyncio.Event() for _ in search_queries]
+
+    async def attempt(index: int):
+        if index and hedge_delay > 0:
+            await started[index - 1].wait()
+            try:
+                async with asyncio.timeout(hedge_delay):
+                    await came_back_empty[index - 1].wait()
+            except TimeoutError:
+                pass
+        async with semaphore:
+            started[index].set()
+            tracks = await _search_spotify_query(search_queries[index], track_limit)
+        if not tracks:
+            came_back_empty[index].set()
+        return tracks
+
+    tasks = [asyncio.create_task(attempt(index)) for index in range(len(search_queries))]
+    try:
+        for task in tasks:
+            tracks = await task
+            if tracks:
+                return tracks
+        return []
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
 
 async def search_spotify_song(track_name: str, artist_name: str, track_limit: int = 1):
-    access_token = await get_spotify_access_token()
-    url = "https://api.spotify.com/v1/search"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-    }
-    
     # Try multiple search strategies
     search_queries = [
         f'track:"{track_name}" artist:"{artist_name}"',  # Exact match
@@ -64,23 +272,18 @@ async def search_spotify_song(track_name: str, artist_name: str, track_limit: in
         f'track:{track_name}',  # Track only
     ]
     
-    async with httpx.AsyncClient() as client:
-        for query in search_queries:
-            params = {
-                "q": query,
-                "type": "track",
-                "limit": track_limit,
-            }
-            
-            response = await client.get(url, headers=headers, params=params)
-            if response.status_code == 200:
-                results = response.json()
-                tracks = results.get("tracks", {}).get("items", [])
-                if tracks:
-                    return tracks
-        
-        # If all searches fail, return empty list
-        return []
+    mode = settings.spotify_search_mode
+    if mode == "concurrent":
+        return await _search_hedged(search_queries, track_limit, 0.0, settings.spotify_search_max_concurrency)
+    if mode == "hedged":
+        return await _search_hedged(
+            search_queries,
+            track_limit,
+            settings.spotify_search_hedge_delay_ms / 1000,
+            settings.spotify_search_max_concurrency,
+        )
+    
+    return await _search_sequential(search_queries, track_limit)
 
 
 async def generate_spotify_tracks(track_name: str, artist_name: str, track_limit: int = 1):
@@ -0,0 +1,117 @@
+"""
+Streaming helpers for NDJSON list responses.
+
+PostgREST returns a JSON array; JSONArraySplitter cuts it into its row
+objects as the bytes arrive so rows can be forwarded one per line without
+ever holding the whole result set in memory.
+"""
+import re
+from typing import AsyncIterator, List, Optional, Type
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+_STRUCTURAL = re.compile(rb'["{}\[\]]')
+_STRING_SPECIAL = re.compile(rb'["\\]')
+
+
+class JSONArraySplitter:
+    """Incrementally split a JSON array of objects into the raw bytes of each object."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._item_start: Optional[int] = None
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """Consume a chunk and return every object completed by it."""
+        buffer = self._buffer
+        buffer += chunk
+        items = []
+        pos = self._pos
+
+        while True:
+            if self._in_string:
+                match = _STRING_SPECIAL.search(buffer, pos)
+                if match is None:
+                    pos = len(buffer)
+                    break
+                index = match.start()
+                if buffer[index] == 0x5C:  # backslash escapes the next byte
+                    if index + 1 >= len(buffer):
+                        pos = index
+                        break
+                    pos = index + 2
+                    continue
+                self._in_string = False
+                pos = index + 1
+                continue
+
+            match = _STRUCTURAL.search(buffer, pos)
+            if match is None:
+                pos = len(buffer)
+                break
+            index = match.start()
+            char = buffer[index]
+            pos = index + 1
+            if char == 0x22:  # "
+                self._in_string = True
+            elif char in (0x7B, 0x5B):  # { [
+                self._depth += 1
+                if self._depth == 2:
+                    self._item_start = index
+            else:  # } ]
+                self._depth -= 1
+                if self._depth == 1 and self._item_start is not None:
+                    items.append(bytes(buffer[self._item_start:index + 1]))
+                    self._item_start = None
+
+        # Drop everything before the object currently being read
+        keep_from = self._item_start if self._item_start is not None else pos
+        del buffer[:keep_from]
+        self._pos = pos - keep_from
+        if self._item_start is not None:
+            self._item_start = 0
+        return items
+
+
+def wants_ndjson(request: Request, stream: bool = False) -> bool:
+    """Whether the client asked for NDJSON via a query flag or the Accept header."""
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+async def ndjson_response(rows: AsyncIterator[bytes], model: Optional[Type[BaseModel]]) -> StreamingResponse:
+    """
+    Stream raw upstream rows as NDJSON, validating each one against `model`.
+
+    Without a model (projected rows), rows are forwarded as they arrive.
+
+    The first row is read before the response starts so upstream errors still
+    surface as regular HTTP errors instead of a truncated 200 stream.
+    """
+    try:
+        first_row = await rows.__anext__()
+    except StopAsyncIteration:
+        first_row = None
+
+    def encode(row: bytes) -> bytes:
+        if model is None:
+            return row + b"\n"
+        return model.model_validate_json(row).model_dump_json().encode("utf-8") + b"\n"
+
+    async def body():
+        try:
+            if first_row is None:
+                return
+            yield encode(first_row)
+            async for row in rows:
+                yield encode(row)
+        finally:
+            await rows.aclose()
+
+    return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE)
@@ -1,15 +1,32 @@
 """
 Supabase service for database operations using REST API.
 """
+import asyncio
 import os
-from typing import Any, Dict, List, Optional
-from httpx import AsyncClient
+import httpx
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
 from fastapi import HTTPException
 from dotenv import load_dotenv
 
+from config import settings
+from services.deadline import request_within_budget
+from services.cache import FRESH, TaggedTTLCache
+from services.http_client import http_client
+from services.metrics import observe_upstream
+from services.resilience import ResiliencePolicy
+from services.singleflight import SingleFlight
+from services.streaming import JSONArraySplitter
+
 # Load environment variables
 load_dotenv()
 
+# Maximum number of values per `in.(...)` filter, keeps query strings well under URL limits
+IN_FILTER_CHUNK_SIZE = 200
+# Maximum number of rows sent in one bulk insert
+BULK_INSERT_CHUNK_SIZE = 1000
+# GET pages larger than this (scans, bulk exports) are tracked apart from small pages and never hedged
+HEDGED_PAGE_MAX_LIMIT = 100
+
 
 class SupabaseService:
     """Service for interacting with Supabase database via REST API."""
@@ -20,67 +37,339 @@ class SupabaseService:
         
         if not self.supabase_url or not self.supabase_key:
             raise ValueError("SUPABASE_URL and SUPABASE_KEY environment variables are required")
+        
+        # Read-through cache of single rows keyed by (table, id), tagged `table:id`
+        self.entity_cache_ttls = settings.entity_cache_ttl_seconds if settings.entity_cache_enabled else {}
+        self.entity_cache = TaggedTTLCache(
+            max_entries=settings.entity_cache_max_entries,
+            max_bytes=settings.entity_cache_max_bytes
+        )
+        # Identical concurrent GETs in flight, keyed by (table, endpoint, params)
+        self.inflight = SingleFlight()
+        # Adaptive timeouts, hedging, retries and circuit breaking for every call
+        self.resilience = ResiliencePolicy(
+            name="Supabase",
+            default_timeout=settings.http_timeout_seconds,
+            min_timeout=settings.supabase_min_timeout_seconds,
+            timeout_percentile=settings.supabase_timeout_percentile,
+            timeout_multiplier=settings.supabase_timeout_multiplier,
+            hedge_enabled=settings.supabase_hedge_enabled,
+            hedge_percentile=settings.supabase_hedge_percentile,
+            hedge_min_delay=settings.supabase_hedge_min_delay_ms / 1000,
+            hedge_max_ratio=settings.supabase_hedge_max_ratio,
+            max_retries=settings.supabase_max_retries,
+            retry_base_delay=settings.supabase_retry_base_delay_ms / 1000,
+            retry_max_delay=settings.supabase_retry_max_delay_ms / 1000,
+            breaker_failure_threshold=settings.supabase_breaker_failure_threshold,
+            breaker_reset_seconds=settings.supabase_breaker_reset_seconds,
+            latency_window=settings.supabase_latency_window,
+            min_samples=settings.supabase_min_latency_samples
+        )
+    
+    def _cache_lookup(self, table: str, record_id: Any) -> Optional[Dict[str, Any]]:
+        """Get a copy of a cached row, or None if the table is uncached or the row is missing."""
+        if table not in self.entity_cache_ttls:
+            return None
+        status, row = self.entity_cache.lookup((table, record_id))
+        return dict(row) if status == FRESH else None
+    
+    def _cache_store(self, table: str, row: Dict[str, Any], since: int):
+        """Cache a row read after `since` (a `TaggedTTLCache.mark()`), unless it was written meanwhile."""
+        ttl = self.entity_cache_ttls.get(table)
+        if ttl and row.get("id") is not None:
+            self.entity_cache.set(
+                (table, row["id"]),
+                dict(row),
+                ttl_seconds=ttl,
+                tags=[f"{table}:{row['id']}"],
+                since=since
+            )
+    
+    def invalidate_cached(self, table: str, record_id: Any):
+        """Drop a cached row, e.g. after it was written outside this service."""
+        self.entity_cache.invalidate_tag(f"{table}:{record_id}")
+    
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "apikey": self.supabase_key,
+            "Authorization": f"Bearer {self.supabase_key}",
+            "Content-Type": "application/json",
+            "Prefer": "return=representation"
+        }
+    
+    async def _stream_rows(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> AsyncIterator[bytes]:
+        """Stream the raw JSON bytes of each row of a GET as they arrive from Supabase."""
+        url = f"{self.supabase_url}/rest/v1/{endpoint}"
+        with observe_upstream(f"supabase/{endpoint.split('?', 1)[0]}", "GET stream"):
+            async with http_client.client.stream("GET", url, headers=self._headers(), params=params) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    raise HTTPException(
+                        status_code=response.status_code,
+                        detail=f"Supabase API error: {response.text}"
+                    )
+                
+                splitter = JSONArraySplitter()
+                async for chunk in response.aiter_bytes():
+                    for row in splitter.feed(chunk):
+                        yield row
     
     async def _make_request(
         self, 
         method: str, 
         endpoint: str, 
-        data: Optional[Dict[str, Any]] = None,
+        data: Optional[Any] = None,
         params: Optional[Dict[str, Any]] = None
     ) -> Any:
         """Make a request to Supabase REST API."""
+        response = await self._send(method, endpoint, data, params)
+        return response.json() if response.content else None
+    
+    async def _make_request_raw(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> bytes:
+        """Make a GET request and return the undecoded JSON body."""
+        response = await self._send("GET", endpoint, params=params)
+        return response.content
+    
+    async def _send(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Any] = None,
+        params: Optional[Dict[str, Any]] = None
+    ) -> httpx.Response:
+        method = method.upper()
+        if method not in ("GET", "POST", "PUT", "PATCH", "DELETE"):
+            raise ValueError(f"Unsupported HTTP method: {method}")
+        
+        table = endpoint.split("?", 1)[0]
+        if method != "GET":
+            try:
+                return await self._dispatch(method, endpoint, data, params)
+            finally:
+                # Reads started before this write must not be shared with later callers
+                self.inflight.forget(lambda key: key[0] == table)
+        
+        if not settings.supabase_coalesce_reads:
+            return await self._dispatch(method, endpoint, data, params)
+        # Identical concurrent GETs share one upstream call; each caller parses its own copy
+        key = (table, endpoint, tuple(sorted((name, str(value)) for name, value in (params or {}).items())))
+        return await self.inflight.do(key, lambda: self._dispatch(method, endpoint, data, params))
+    
+    async def _dispatch(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Any] = None,
+        params: Optional[Dict[str, Any]] = None
+    ) -> httpx.Response:
+        """Send one logical request; only GETs are retried, and only small GETs are hedged."""
+        call_class, hedge = self._call_class(method, endpoint, params)
+        return await self.resilience.call(
+            lambda timeout: self._request(method, endpoint, data, params, timeout),
+            idempotent=method == "GET",
+            key=call_class,
+            hedge=hedge
+        )
+    
+    @staticmethod
+    def _call_class(method: str, endpoint: str, params: Optional[Dict[str, Any]]) -> Tuple[str, bool]:
+        """Get the latency class of a request (e.g. "GET songs one") and whether it may be hedged."""
+        table = endpoint.split("?", 1)[0]
+        if method != "GET":
+            return f"{method} {table}", False
+        
+        params = params or {}
+        if "limit" in params:
+            kind = "page" if int(params["limit"]) <= HEDGED_PAGE_MAX_LIMIT else "bulk"
+        elif "?id=eq." in endpoint or str(params.get("id", "")).startswith("eq."):
+            kind = "one"
+        elif any(str(value).startswith("in.(") for value in params.values()):
+            kind = "in"
+        else:
+            # Unbounded filtered lists, e.g. every line of a lyrics record
+            kind = "all"
+        return f"GET {table} {kind}", kind in ("one", "in", "page")
+    
+    async def _request(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Any],
+        params: Optional[Dict[str, Any]],
+        timeout: float
+    ) -> httpx.Response:
         url = f"{self.supabase_url}/rest/v1/{endpoint}"
-        headers = {
-            "apikey": self.supabase_key,
-            "Authorization": f"Bearer {self.supabase_key}",
-            "Content-Type": "application/json",
-            "Prefer": "return=representation"
-        }
+        headers = self._headers()
         
-        async with AsyncClient() as client:
-            if method.upper() == "GET":
-                response = await client.get(url, headers=headers, params=params)
-            elif method.upper() == "POST":
-                response = await client.post(url, headers=headers, json=data, params=params)
-            elif method.upper() == "PUT":
-                response = await client.put(url, headers=headers, json=data, params=params)
-            elif method.upper() == "PATCH":
-                response = await client.patch(url, headers=headers, json=data, params=params)
-            elif method.upper() == "DELETE":
-                response = await client.delete(url, headers=headers, params=params)
-            else:
-                raise ValueError(f"Unsupported HTTP method: {method}")
-            
-            if response.status_code >= 400:
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Supabase API error: {response.text}"
-                )
-            
-            return response.json() if response.content else None
+        with observe_upstream(f"supabase/{endpoint.split('?', 1)[0]}", method):
+            response = await request_within_budget(
+                http_client.client,
+                method,
+                url,
+                timeout,
+                headers=headers,
+                json=data if method in ("POST", "PUT", "PATCH") else None,
+                params=params
+            )
+        
+        if response.status_code >= 400:
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"Supabase API error: {response.text}"
+            )
+        
+        return response
     
-    async def get(self, table: str, record_id: int) -> Optional[Dict[str, Any]]:
-        """Get a single record by ID."""
+    @staticmethod
+    def _page_params(skip: int, limit: int, after_id: Optional[int]) -> Dict[str, Any]:
+        """Build ordering and paging params, preferring keyset paging over OFFSET."""
+        params: Dict[str, Any] = {"order": "id", "limit": limit}
+        if after_id is not None:
+            params["id"] = f"gt.{after_id}"
+        else:
+            params["offset"] = skip
+        return params
+    
+    async def get(self, table: str, record_id: int, use_cache: bool = True) -> Optional[Dict[str, Any]]:
+        """Get a single record by ID, served from the entity cache when possible."""
+        if use_cache:
+            cached = self._cache_lookup(table, record_id)
+            if cached is not None:
+                return cached
+        
+        since = TaggedTTLCache.mark()
         try:
             result = await self._make_request("GET", f"{table}?id=eq.{record_id}")
-            return result[0] if result else None
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get record: {str(e)}")
+        
+        if not result:
+            return None
+        self._cache_store(table, result[0], since)
+        return result[0]
+    
+    async def get_many(
+        self,
+        table: str,
+        record_ids: Iterable[int],
+        use_cache: bool = True,
+        select: Optional[str] = None
+    ) -> Dict[int, Dict[str, Any]]:
+        """
+        Get several records by ID in one `id=in.(...)` query, keyed by ID.
+        
+        With `select`, only those columns are fetched (and projected from
+        cached rows); partial rows are not cached.
+        """
+        columns = select.split(",") if select else None
+        records: Dict[int, Dict[str, Any]] = {}
+        missing_ids = []
+        for record_id in dict.fromkeys(record_ids):
+            if record_id is None:
+                continue
+            cached = self._cache_lookup(table, record_id) if use_cache else None
+            if cached is not None:
+                records[record_id] = {column: cached.get(column) for column in columns} if columns else cached
+            else:
+                missing_ids.append(record_id)
+        
+        since = TaggedTTLCache.mark()
+        for row in await self.search_in(table, "id", missing_ids, select=select):
+            if not columns:
+                self._cache_store(table, row, since)
+            records[row["id"]] = row
+        return records
+    
+    async def search_in(
+        self,
+        table: str,
+        field: str,
+        values: Iterable[Any],
+        select: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Get all records whose `field` is one of `values`, ordered by ID, optionally only `select` columns."""
+        unique_values = list(dict.fromkeys(v for v in values if v is not None))
+        if not unique_values:
+            return []
+        
+        chunks = [
+            unique_values[i:i + IN_FILTER_CHUNK_SIZE]
+            for i in range(0, len(unique_values), IN_FILTER_CHUNK_SIZE)
+        ]
+        extra = {"select": select} if select else {}
+        try:
+            results = await asyncio.gather(*[
+                self._make_request("GET", table, params={
+                    field: f"in.({','.join(str(v) for v in chunk)})",
+                    "order": "id",
+                    **extra
+                })
+                for chunk in chunks
+            ])
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to get records: {str(e)}")
+        
+        rows = [row for result in results for row in (result or [])]
+        if len(chunks) > 1:
+            rows.sort(key=lambda row: row["id"])
+        return rows
+    
+    async def attach_related(
+        self,
+        rows: List[Dict[str, Any]],
+        relations: Dict[str, Tuple[str, ...]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Attach related records to each row in place.
+        
+        `relations` maps the attribute to set on each row to a
+        `(table, foreign_key)` pair, e.g. `{"song": ("songs", "song_id")}`,
+        optionally followed by a `select` of the columns to load.
+        Each related table is fetched with one batched query, and the tables
+        are loaded concurrently, so the cost does not grow with `len(rows)`.
+        """
+        if not rows or not relations:
+            return rows
+        
+        attributes = list(relations)
+        lookups = await asyncio.gather(*[
+            self.get_many(
+                relations[attr][0],
+                [row.get(relations[attr][1]) for row in rows],
+                select=relations[attr][2] if len(relations[attr]) > 2 else None
+            )
+            for attr in attributes
+        ])
+        
+        for attr, records in zip(attributes, lookups):
+            foreign_key = relations[attr][1]
+            for row in rows:
+                if row.get(foreign_key):
+                    row[attr] = records.get(row[foreign_key])
+        return rows
     
     async def get_multi(
         self, 
         table: str, 
         skip: int = 0, 
         limit: int = 100,
-        filters: Optional[Dict[str, Any]] = None
+        filters: Optional[Dict[str, Any]] = None,
+        after_id: Optional[int] = None,
+        select: Optional[str] = None
     ) -> List[Dict[str, Any]]:
-        """Get multiple records with pagination and optional filters."""
+        """
+        Get multiple records with pagination and optional filters, optionally only `select` columns.
+        
+        When `after_id` is given, pages by `id > after_id` (keyset) and `skip` is ignored.
+        """
         try:
-            params = {
-                "order": "id",
-                "offset": skip,
-                "limit": limit
-            }
+            params = self._page_params(skip, limit, after_id)
+            if select:
+                params["select"] = select
             
             if filters:
                 for key, value in filters.items():
@@ -88,53 +377,205 @@ class SupabaseService:
             
             result = await self._make_request("GET", table, params=params)
             return result or []
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get records: {str(e)}")
     
+    async def get_all(
+        self,
+        table: str,
+        filters: Dict[str, Any],
+        select: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Get every record matching equality filters, ordered by ID, optionally only `select` columns."""
+        params = {key: f"eq.{value}" for key, value in filters.items()}
+        params["order"] = "id"
+        if select:
+            params["select"] = select
+        try:
+            result = await self._make_request("GET", table, params=params)
+            return result or []
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to get records: {str(e)}")
+    
+    async def get_multi_raw(
+        self,
+        table: str,
+        select: str,
+        skip: int = 0,
+        limit: int = 100,
+        filters: Optional[Dict[str, Any]] = None,
+        after_id: Optional[int] = None
+    ) -> bytes:
+        """Like get_multi, but return PostgREST's JSON array bytes for the `select` columns."""
+        params = self._page_params(skip, limit, after_id)
+        params["select"] = select
+        for key, value in (filters or {}).items():
+            params[key] = f"eq.{value}"
+        return await self._make_request_raw(table, params=params)
+    
+    def stream_multi(
+        self,
+        table: str,
+        skip: int = 0,
+        limit: int = 100,
+        filters: Optional[Dict[str, Any]] = None,
+        after_id: Optional[int] = None,
+        select: Optional[str] = None
+    ) -> AsyncIterator[bytes]:
+        """Like get_multi, but yield each row's raw JSON bytes as it arrives."""
+        params = self._page_params(skip, limit, after_id)
+        if select:
+            params["select"] = select
+        for key, value in (filters or {}).items():
+            params[key] = f"eq.{value}"
+        return self._stream_rows(table, params=params)
+    
+    async def scan(self, table: str, page_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """Yield every record of a table, fetched in keyset pages ordered by ID."""
+        after_id = None
+        while True:
+            rows = await self.get_multi(table, limit=page_size, after_id=after_id)
+            for row in rows:
+                yield row
+            if len(rows) < page_size:
+                return
+            after_id = rows[-1]["id"]
+    
     async def create(self, table: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new record."""
         try:
             result = await self._make_request("POST", table, data=data)
             return result[0] if result else {}
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to create record: {str(e)}")
     
-    async def update(self, table: str, record_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Update a record by ID."""
+    async def create_many(self, table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Create several records with bulk array inserts, returning them in order."""
+        created: List[Dict[str, Any]] = []
         try:
-            result = await self._make_request("PATCH", f"{table}?id=eq.{record_id}", data=data)
-            return result[0] if result else {}
+            for i in range(0, len(rows), BULK_INSERT_CHUNK_SIZE):
+                result = await self._make_request("POST", table, data=rows[i:i + BULK_INSERT_CHUNK_SIZE])
+                created.extend(result or [])
+            return created
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to create records: {str(e)}")
+    
+    async def delete_where(self, table: str, filters: Dict[str, Any]) -> int:
+        """Delete all records matching equality filters, returning how many were deleted."""
+        if not filters:
+            raise ValueError("delete_where requires at least one filter")
+        
+        params = {key: f"eq.{value}" for key, value in filters.items()}
+        params["select"] = "id"
+        try:
+            result = await self._make_request("DELETE", table, params=params)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to delete records: {str(e)}")
+        
+        for row in result or []:
+            self.invalidate_cached(table, row["id"])
+        return len(result or [])
+    
+    async def delete_in(self, table: str, field: str, values: Iterable[Any]) -> int:
+        """Delete all records whose `field` is one of `values`, returning how many were deleted."""
+        unique_values = list(dict.fromkeys(v for v in values if v is not None))
+        if not unique_values:
+            return 0
+        
+        chunks = [
+            unique_values[i:i + IN_FILTER_CHUNK_SIZE]
+            for i in range(0, len(unique_values), IN_FILTER_CHUNK_SIZE)
+        ]
+        try:
+            results = await asyncio.gather(*[
+                self._make_request("DELETE", table, params={
+                    field: f"in.({','.join(str(v) for v in chunk)})",
+                    "select": "id"
+                })
+                for chunk in chunks
+            ])
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to delete records: {str(e)}")
+        
+        rows = [row for result in results for row in (result or [])]
+        for row in rows:
+            self.invalidate_cached(table, row["id"])
+        return len(rows)
+    
+    async def update(
+        self,
+        table: str,
+        record_id: int,
+        data: Dict[str, Any],
+        filters: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Update a record by ID, returning the updated record or None if it does not exist.
+        
+        With `filters`, the record is only updated if it also matches them (e.g. its owner).
+        """
+        params = {key: f"eq.{value}" for key, value in (filters or {}).items()}
+        params["id"] = f"eq.{record_id}"
+        try:
+            result = await self._make_request("PATCH", table, data=data, params=params)
+            return result[0] if result else None
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to update record: {str(e)}")
+        finally:
+            self.invalidate_cached(table, record_id)
     
-    async def delete(self, table: str, record_id: int) -> bool:
-        """Delete a record by ID."""
+    async def delete(self, table: str, record_id: int, filters: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Delete a record by ID, returning False if it does not exist.
+        
+        With `filters`, the record is only deleted if it also matches them (e.g. its owner).
+        """
+        params = {key: f"eq.{value}" for key, value in (filters or {}).items()}
+        params.update({"id": f"eq.{record_id}", "select": "id"})
         try:
-            await self._make_request("DELETE", f"{table}?id=eq.{record_id}")
-            return True
+            # Only the deleted IDs are returned, so not-found is known without a pre-fetch
+            result = await self._make_request("DELETE", table, params=params)
+            return bool(result)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to delete record: {str(e)}")
+        finally:
+            self.invalidate_cached(table, record_id)
     
     async def search(
         self, 
         table: str, 
         search_params: Dict[str, Any],
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        after_id: Optional[int] = None
     ) -> List[Dict[str, Any]]:
-        """Search records with custom parameters."""
+        """Search records with custom parameters, paging by `skip` or keyset `after_id`."""
         try:
-            params = {
-                "order": "id",
-                "offset": skip,
-                "limit": limit
-            }
+            params = self._page_params(skip, limit, after_id)
             
             for key, value in search_params.items():
                 params[key] = f"eq.{value}"
             
             result = await self._make_request("GET", table, params=params)
             return result or []
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to search records: {str(e)}")
 
@@ -155,6 +596,8 @@ class SupabaseService:
             }
             result = await self._make_request("GET", table, params=params)
             return result or []
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to search records with pattern: {str(e)}")
 
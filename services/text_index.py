@@ -0,0 +1,220 @@
+"""
+Character n-gram inverted index for searching short Japanese/CJK text.
+
+Japanese has no word boundaries, so documents are split into overlapping
+character n-grams instead of words. Text is normalized first (NFKC width
+folding, casefolding, katakana to hiragana) so that half-width/full-width
+and kana variants of the same phrase match each other.
+"""
+import abc
+import asyncio
+import logging
+import re
+import sys
+import time
+import unicodedata
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Splits on anything that is not a letter, digit or kana/kanji
+_SEPARATORS = re.compile(r"[\W_]+")
+
+# Katakana ァ (U+30A1) .. ヶ (U+30F6) map onto hiragana by a fixed offset
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+
+
+def normalize_text(text: str) -> str:
+    """Fold width, case and kana variants so equivalent text compares equal."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return text.translate(_KATAKANA_TO_HIRAGANA)
+
+
+def tokenize(normalized: str) -> List[str]:
+    return [token for token in _SEPARATORS.split(normalized) if token]
+
+
+def text_grams(normalized: str, n: int = 2, min_n: int = 2) -> Set[str]:
+    """
+    Return the distinct n-grams of every token, for sizes `min_n` to `n`.
+
+    Tokens shorter than `min_n` are kept whole so single-character words
+    can still be found.
+    """
+    grams: Set[str] = set()
+    for token in tokenize(normalized):
+        if len(token) < min_n:
+            grams.add(token)
+            continue
+        for size in range(min_n, n + 1):
+            grams.update(token[i:i + size] for i in range(len(token) - size + 1))
+    return grams
+
+
+class NGramIndex:
+    """Inverted index from character n-grams to the IDs of documents containing them."""
+
+    def __init__(self, n: int = 2, min_n: int = 2):
+        self.n = n
+        self.min_n = min_n
+        self._postings: Dict[str, Set[Hashable]] = {}
+        self._docs: Dict[Hashable, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, doc_id: Hashable) -> bool:
+        return doc_id in self._docs
+
+    def _grams(self, normalized: str) -> Set[str]:
+        return text_grams(normalized, self.n, self.min_n)
+
+    def add(self, doc_id: Hashable, text: str):
+        """Index a document, replacing any previous text for the same ID."""
+        self.remove(doc_id)
+        normalized = normalize_text(text)
+        self._docs[doc_id] = normalized
+        for gram in self._grams(normalized):
+            self._postings.setdefault(gram, set()).add(doc_id)
+
+    def remove(self, doc_id: Hashable):
+        normalized = self._docs.pop(doc_id, None)
+        if normalized is None:
+            return
+        for gram in self._grams(normalized):
+            doc_ids = self._postings.get(gram)
+            if doc_ids is not None:
+                doc_ids.discard(doc_id)
+                if not doc_ids:
+                    del self._postings[gram]
+
+    def text(self, doc_id: Hashable) -> str:
+        """Return the normalized text stored for a document."""
+        return self._docs[doc_id]
+
+    def search(self, query: str, min_coverage: float = 0.6) -> List[Tuple[Hashable, float]]:
+        """
+        Rank documents sharing at least `min_coverage` of the query's n-grams.
+
+        Documents containing the whole normalized query score higher, and
+        those starting with it higher still; ties go to the shorter document.
+        """
+        normalized = normalize_text(query).strip()
+        query_grams = self._grams(normalized)
+        if not query_grams:
+            return []
+
+        counts: Dict[Hashable, int] = {}
+        if min_coverage >= 1:
+            # Every gram is required: intersect posting lists, smallest first
+            postings = sorted((self._postings.get(gram, set()) for gram in query_grams), key=len)
+            candidates = set(postings[0])
+            for doc_ids in postings[1:]:
+                if not candidates:
+                    break
+                candidates &= doc_ids
+            counts = dict.fromkeys(candidates, len(query_grams))
+        else:
+            for gram in query_grams:
+                for doc_id in self._postings.get(gram, ()):
+                    counts[doc_id] = counts.get(doc_id, 0) + 1
+
+        needed = len(query_grams) * min_coverage
+        ranked = []
+        for doc_id, count in counts.items():
+            if count < needed:
+                continue
+            text = self._docs[doc_id]
+            score = count / len(query_grams)
+            position = text.find(normalized)
+            if position == 0:
+                score += 1.5
+            elif position > 0:
+                score += 1.0
+            ranked.append((doc_id, score, len(text)))
+
+        ranked.sort(key=lambda item: (-item[1], item[2]))
+        return [(doc_id, score) for doc_id, score, _ in ranked]
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the index structures, in bytes."""
+        size = sys.getsizeof(self._postings) + sys.getsizeof(self._docs)
+        for gram, doc_ids in self._postings.items():
+            size += sys.getsizeof(gram) + sys.getsizeof(doc_ids)
+        for text in self._docs.values():
+            size += sys.getsizeof(text)
+        return size
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "documents": len(self._docs),
+            "grams": len(self._postings),
+            "memory_bytes": self.memory_bytes(),
+        }
+
+
+class LiveIndex(abc.ABC):
+    """
+    Base for in-memory indexes loaded from Supabase in the background and
+    then kept current by the write endpoints.
+
+    Writes made while a load is in progress are recorded with `_record` and
+    replayed onto the freshly loaded index before it is swapped in.
+    """
+
+    name = "index"
+
+    def __init__(self):
+        self.ready = False
+        self._pending: Optional[List[Tuple[str, tuple]]] = None
+        self._build_task: Optional[asyncio.Task] = None
+        self.build_seconds: Optional[float] = None
+
+    def _record(self, method: str, *args):
+        if self._pending is not None:
+            self._pending.append((method, args))
+
+    @abc.abstractmethod
+    async def _load(self) -> "LiveIndex":
+        """Return a new, fully loaded instance."""
+
+    @abc.abstractmethod
+    def _adopt(self, fresh: "LiveIndex"):
+        """Take over the data structures of a freshly loaded instance."""
+
+    async def build(self):
+        """Load everything into a fresh index, swap it in and replay concurrent writes."""
+        started = time.perf_counter()
+        self._pending = []
+        try:
+            fresh = await self._load()
+        except BaseException:
+            self._pending = None
+            raise
+
+        pending, self._pending = self._pending, None
+        self._adopt(fresh)
+        for method, args in pending:
+            getattr(self, method)(*args)
+        self.ready = True
+        self.build_seconds = time.perf_counter() - started
+
+    async def _build_in_background(self):
+        try:
+            await self.build()
+        except Exception as e:
+            logger.warning("Failed to build %s, using database search: %s", self.name, e)
+
+    def start(self):
+        """Build the index in the background. Called from the app lifespan."""
+        if self._build_task is None:
+            self._build_task = asyncio.create_task(self._build_in_background())
+
+    async def stop(self):
+        if self._build_task is not None:
+            self._build_task.cancel()
+            await asyncio.gather(self._build_task, return_exceptions=True)
+            self._build_task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"ready": self.ready, "build_seconds": self.build_seconds}
@@ -0,0 +1,108 @@
+import asyncio
+import itertools
+import json
+import os
+
+# Settings and SupabaseService refuse to start without credentials; tests never reach the network
+os.environ.setdefault("SUPABASE_URL", "http://supabase.test")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+os.environ.setdefault("JWT_SECRET", "test-secret-with-at-least-32-bytes")
+os.environ.setdefault("SPOTIFY_CLIENT_ID", "test-client")
+os.environ.setdefault("SPOTIFY_CLIENT_SECRET", "test-client-secret")
+
+import httpx
+import pytest
+
+from services.http_client import http_client
+from services.supabase_service import supabase_service
+
+
+@pytest.fixture
+def mock_transport():
+    """
+    Install a handler as the shared HTTP client's transport.
+
+    Call it with an `httpx.MockTransport` handler; it returns the client it
+    installed. The previous client is restored and every installed client
+    is closed after the test.
+    """
+    previous = http_client._client
+    clients = []
+
+    def install(handler) -> httpx.AsyncClient:
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        clients.append(client)
+        http_client._client = client
+        return client
+
+    yield install
+    http_client._client = previous
+    for client in clients:
+        asyncio.run(client.aclose())
+
+
+def _matches(row, column, condition):
+    op, _, value = condition.partition(".")
+    actual = row.get(column)
+    if op == "eq":
+        return str(actual) == value
+    if op == "gt":
+        return actual is not None and actual > int(value)
+    if op == "in":
+        return str(actual) in value.strip("()").split(",")
+    raise ValueError(f"Unsupported filter {condition}")
+
+
+class FakePostgREST:
+    """In-memory tables answering the subset of PostgREST the services use."""
+
+    def __init__(self):
+        self.tables = {}
+        self.requests = []
+        self._ids = itertools.count(1000)
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        table = request.url.path.rsplit("/", 1)[-1]
+        rows = self.tables.setdefault(table, {})
+        matched = sorted(rows.values(), key=lambda row: row["id"])
+        select, limit, offset = None, None, 0
+        for column, condition in request.url.params.multi_items():
+            if column == "select":
+                select = None if condition == "*" else condition.split(",")
+            elif column == "limit":
+                limit = int(condition)
+            elif column == "offset":
+                offset = int(condition)
+            elif column != "order":
+                matched = [row for row in matched if _matches(row, column, condition)]
+
+        if request.method == "POST":
+            payload = json.loads(request.content)
+            matched = []
+            for data in payload if isinstance(payload, list) else [payload]:
+                row = {"created_at": "2024-01-01T00:00:00+00:00", **data, "id": next(self._ids)}
+                rows[row["id"]] = row
+                matched.append(row)
+            return httpx.Response(201, json=matched)
+        if request.method == "PATCH":
+            for row in matched:
+                row.update(json.loads(request.content))
+        elif request.method == "DELETE":
+            for row in matched:
+                del rows[row["id"]]
+        else:
+            matched = matched[offset:None if limit is None else offset + limit]
+        if select:
+            matched = [{column: row.get(column) for column in select} for row in matched]
+        return httpx.Response(200, json=matched)
+
+
+@pytest.fixture
+def postgrest(mock_transport):
+    """Route Supabase calls to an empty FakePostgREST with a cold entity cache."""
+    fake = FakePostgREST()
+    supabase_service.entity_cache.clear()
+    mock_transport(fake)
+    yield fake
+    supabase_service.entity_cache.clear()
@@ -0,0 +1,59 @@
+"""
+Checks conditional GETs: a matching If-None-Match is answered with 304, and a
+write to the row makes the next request return the new body.
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from services.conditional import response_validators
+
+
+@pytest.fixture
+def client(postgrest):
+    response_validators.clear()
+    postgrest.tables["songs"] = {
+        1: {"id": 1, "title": "First", "artist": "Someone", "created_at": "2024-01-01T00:00:00+00:00"},
+    }
+    yield TestClient(app)
+    response_validators.clear()
+
+
+def test_matching_etag_is_not_modified(client, postgrest):
+    first = client.get("/api/songs/1")
+    etag = first.headers["ETag"]
+    reads = len(postgrest.requests)
+
+    second = client.get("/api/songs/1", headers={"If-None-Match": etag})
+
+    assert first.status_code == 200
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["ETag"] == etag
+    # Answered from the remembered validator without reading the row again
+    assert len(postgrest.requests) == reads
+
+
+def test_weak_and_listed_etags_match(client):
+    etag = client.get("/api/songs/1").headers["ETag"]
+
+    response = client.get("/api/songs/1", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert response.status_code == 304
+
+
+def test_stale_etag_gets_the_full_body(client):
+    response = client.get("/api/songs/1", headers={"If-None-Match": '"stale"'})
+
+    assert response.status_code == 200
+    assert response.json()["title"] == "First"
+
+
+def test_write_invalidates_the_etag(client):
+    etag = client.get("/api/songs/1").headers["ETag"]
+
+    assert client.put("/api/songs/1", json={"title": "Renamed", "artist": "Someone"}).status_code == 200
+    response = client.get("/api/songs/1", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.json()["title"] == "Renamed"
+    assert response.headers["ETag"] != etag
@@ -0,0 +1,47 @@
+"""
+Checks that updating lyrics replaces their lines without ever leaving the
+lyrics with none: old lines are only deleted once the new ones are stored.
+"""
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+
+
+@pytest.fixture
+def client(postgrest):
+    postgrest.tables["lyrics"] = {
+        1: {"id": 1, "synced_lyrics": "[00:01.00]old", "created_at": "2024-01-01T00:00:00+00:00"},
+    }
+    postgrest.tables["lyric_lines"] = {
+        50: {"id": 50, "lyrics_id": 1, "start_time_ms": 1000, "text_content": "old"},
+        51: {"id": 51, "lyrics_id": 2, "start_time_ms": 1000, "text_content": "other"},
+    }
+    return TestClient(app)
+
+
+def _texts(postgrest, lyrics_id):
+    return [line["text_content"] for line in postgrest.tables["lyric_lines"].values() if line["lyrics_id"] == lyrics_id]
+
+
+def test_update_replaces_the_lines(client, postgrest):
+    response = client.put("/api/lyrics/1", json={"synced_lyrics": "[00:01.00]new\n[00:02.00]second"})
+
+    assert response.status_code == 200
+    assert [line["text_content"] for line in response.json()["lyric_lines"]] == ["new", "second"]
+    assert _texts(postgrest, 1) == ["new", "second"]
+    assert _texts(postgrest, 2) == ["other"]
+
+
+def test_failed_insert_keeps_the_old_lines(client, postgrest, mock_transport):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "POST" and request.url.path.endswith("/lyric_lines"):
+            return httpx.Response(400, json={"message": "invalid line"})
+        return postgrest(request)
+
+    mock_transport(handler)
+    response = client.put("/api/lyrics/1", json={"synced_lyrics": "[00:01.00]new"})
+
+    assert response.status_code == 400
+    assert _texts(postgrest, 1) == ["old"]
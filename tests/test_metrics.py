@@ -0,0 +1,24 @@
+"""
+Checks the route labels MetricsMiddleware records.
+"""
+from types import SimpleNamespace
+
+from services.metrics import _route_label
+
+
+def _scope(path: str, path_format: str):
+    return {"path": path, "route": SimpleNamespace(path_format=path_format)}
+
+
+def test_label_keeps_params_that_share_a_value():
+    scope = _scope("/api/progress/stats/users/1/songs/1", "/api/progress/stats/users/{user_id}/songs/{matched_song_id}")
+    assert _route_label(scope) == "/api/progress/stats/users/{user_id}/songs/{matched_song_id}"
+
+
+def test_label_adds_the_router_prefix_to_a_relative_template():
+    assert _route_label(_scope("/api/matched/matched", "/{matched_id}")) == "/api/matched/{matched_id}"
+    assert _route_label(_scope("/api/library/", "/")) == "/api/library/"
+
+
+def test_unmatched_requests_share_one_label():
+    assert _route_label({"path": "/nope"}) == "unmatched"
@@ -0,0 +1,109 @@
+"""
+Checks how ProgressBuffer handles rejected and failed bulk inserts.
+"""
+import asyncio
+import itertools
+import json
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from services.deadline import _deadline
+from services.progress_buffer import ProgressBuffer
+
+
+@pytest.fixture
+def upstream(mock_transport):
+    """Route Supabase calls to a mock PostgREST that refuses rows marked bad."""
+    state = {"status": None, "rejection": 400}
+    ids = itertools.count(1)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if state["status"] is not None:
+            return httpx.Response(state["status"], json={"message": "unavailable"})
+        rows = json.loads(request.content)
+        if any(row.get("bad") for row in rows):
+            return httpx.Response(state["rejection"], json={"message": "invalid row"})
+        return httpx.Response(201, json=[{**row, "id": next(ids)} for row in rows])
+
+    mock_transport(handler)
+    return state
+
+
+def _buffer() -> ProgressBuffer:
+    return ProgressBuffer("user_progress", max_batch=1000, flush_interval_seconds=60, max_buffered=1000)
+
+
+@pytest.mark.parametrize("rejection", [400, 409, 422])
+def test_rejected_rows_are_isolated_and_dropped(upstream, rejection):
+    upstream["rejection"] = rejection
+
+    async def run():
+        buffer = _buffer()
+        stored = []
+        buffer.add_listener(stored.extend)
+
+        good = asyncio.create_task(buffer.add([{"line_number": i} for i in range(7)]))
+        bad = asyncio.create_task(buffer.add([{"line_number": 7, "bad": True}]))
+        await asyncio.sleep(0)
+        await buffer.flush()
+
+        assert await good == 7
+        with pytest.raises(HTTPException) as raised:
+            await bad
+        assert raised.value.status_code == 422
+        assert sorted(row["line_number"] for row in stored) == list(range(7))
+        assert buffer.dropped_rows == 1
+        assert buffer.buffered == 0
+
+    asyncio.run(run())
+
+
+def test_transient_failure_requeues_unacknowledged_rows(upstream):
+    async def run():
+        buffer = _buffer()
+        await buffer.add([{"line_number": 1}], wait=False)
+        upstream["status"] = 503
+        await buffer.flush()
+
+        assert buffer.failed_flushes == 1
+        assert buffer.buffered == 1
+
+        upstream["status"] = None
+        await buffer.flush()
+        assert buffer.flushed_rows == 1
+        assert buffer.buffered == 0
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("status", [401, 403, 404, 408, 429, 500, 503])
+def test_request_level_errors_fail_the_whole_batch(upstream, status):
+    async def run():
+        buffer = _buffer()
+        calls = []
+        buffer.add_listener(calls.append)
+        await buffer.add([{"line_number": i} for i in range(8)], wait=False)
+        upstream["status"] = status
+        await buffer.flush()
+
+        # Not bisected and nothing dropped: every row waits for the next flush
+        assert buffer.dropped_rows == 0
+        assert buffer.failed_flushes == 1
+        assert buffer.buffered == 8
+        assert calls == []
+
+    asyncio.run(run())
+
+
+def test_flush_does_not_inherit_the_request_deadline(upstream):
+    async def run():
+        buffer = ProgressBuffer("user_progress", max_batch=1, flush_interval_seconds=60, max_buffered=1000)
+        # The request that fills the batch has already used up its budget
+        _deadline.set(time.monotonic())
+        assert await asyncio.wait_for(buffer.add([{"line_number": 1}]), timeout=5) == 1
+        assert buffer.flushed_rows == 1
+
+    asyncio.run(run())
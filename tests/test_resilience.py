@@ -0,0 +1,56 @@
+"""
+Checks that ResiliencePolicy keeps latency, timeouts and hedging per call class.
+"""
+import asyncio
+
+from services.resilience import ResiliencePolicy
+
+
+def _policy() -> ResiliencePolicy:
+    return ResiliencePolicy(
+        name="test",
+        default_timeout=10.0,
+        min_timeout=0.01,
+        timeout_percentile=99,
+        timeout_multiplier=3,
+        hedge_enabled=True,
+        hedge_percentile=95,
+        hedge_min_delay=0.001,
+        hedge_max_ratio=1.0,
+        max_retries=0,
+        retry_base_delay=0.001,
+        retry_max_delay=0.001,
+        breaker_failure_threshold=5,
+        breaker_reset_seconds=1,
+        latency_window=100,
+        min_samples=5
+    )
+
+
+def test_fast_calls_do_not_set_the_timeout_of_slow_ones():
+    policy = _policy()
+    for _ in range(20):
+        policy.latency("GET songs one").add(0.001)
+
+    assert policy.timeout("GET songs one") == 0.01
+    assert policy.timeout("GET user_progress bulk") == 10.0
+    assert policy.hedge_delay("GET user_progress bulk") is None
+
+
+def test_unhedged_calls_get_a_single_attempt():
+    policy = _policy()
+    for _ in range(20):
+        policy.latency("GET user_progress bulk").add(0.001)
+    attempts = []
+
+    async def slow(timeout: float) -> str:
+        attempts.append(timeout)
+        await asyncio.sleep(0.02)
+        return "rows"
+
+    assert asyncio.run(policy.call(slow, key="GET user_progress bulk", hedge=False)) == "rows"
+    assert len(attempts) == 1
+    assert policy.hedges == 0
+
+    assert asyncio.run(policy.call(slow, key="GET user_progress bulk")) == "rows"
+    assert policy.hedges == 1
@@ -0,0 +1,95 @@
+"""
+Checks the URLs SupabaseService builds for writes, so a row filter can never
+be dropped from an UPDATE or DELETE, and that writes keep the entity cache
+from serving rows read before them.
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from services.supabase_service import supabase_service
+
+
+@pytest.fixture
+def sent(mock_transport):
+    """Route Supabase calls to a mock transport and record the requests."""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json=[{"id": 7}])
+
+    mock_transport(handler)
+    return requests
+
+
+def _query(request: httpx.Request):
+    return sorted(request.url.params.multi_items())
+
+
+def test_update_filters_by_id(sent):
+    asyncio.run(supabase_service.update("songs", 7, {"title": "x"}))
+
+    assert sent[0].method == "PATCH"
+    assert sent[0].url.path == "/rest/v1/songs"
+    assert _query(sent[0]) == [("id", "eq.7")]
+    assert json.loads(sent[0].content) == {"title": "x"}
+
+
+def test_delete_filters_by_id(sent):
+    assert asyncio.run(supabase_service.delete("songs", 7)) is True
+
+    assert sent[0].method == "DELETE"
+    assert sent[0].url.path == "/rest/v1/songs"
+    assert _query(sent[0]) == [("id", "eq.7"), ("select", "id")]
+
+
+def test_delete_where_keeps_every_filter(sent):
+    assert asyncio.run(supabase_service.delete_where("user_progress", {"session_id": 3, "user_id": 1})) == 1
+
+    assert sent[0].method == "DELETE"
+    assert sent[0].url.path == "/rest/v1/user_progress"
+    assert _query(sent[0]) == [("select", "id"), ("session_id", "eq.3"), ("user_id", "eq.1")]
+
+
+def test_delete_where_refuses_an_unfiltered_delete(sent):
+    with pytest.raises(ValueError):
+        asyncio.run(supabase_service.delete_where("user_progress", {}))
+    assert sent == []
+
+
+def test_read_racing_a_write_is_not_cached(mock_transport):
+    async def run():
+        read_started = asyncio.Event()
+        release_read = asyncio.Event()
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if request.method == "GET":
+                read_started.set()
+                await release_read.wait()
+                return httpx.Response(200, json=[{"id": 9, "title": "old"}])
+            return httpx.Response(200, json=[{"id": 9, "title": "new"}])
+
+        mock_transport(handler)
+        read = asyncio.create_task(supabase_service.get("songs", 9))
+        await read_started.wait()
+        await supabase_service.update("songs", 9, {"title": "new"})
+        release_read.set()
+
+        assert (await read)["title"] == "old"
+        assert supabase_service._cache_lookup("songs", 9) is None
+
+    asyncio.run(run())
+
+
+def test_upstream_status_is_kept(mock_transport):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(409, json={"message": "duplicate key"})
+
+    mock_transport(handler)
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(supabase_service.create("songs", {"title": "x"}))
+    assert raised.value.status_code == 409
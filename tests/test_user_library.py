@@ -0,0 +1,110 @@
+"""
+Checks that library routes only ever read or write the caller's own entries,
+and that the list's X-Next-Cursor pages through them without gaps.
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from services.auth_service import token_verifier
+from services.pagination import NEXT_CURSOR_HEADER
+
+ALICE = {"id": 1, "email": "alice@example.com", "username": "alice", "created_at": "2024-01-01T00:00:00+00:00"}
+BOB = {"id": 2, "email": "bob@example.com", "username": "bob", "created_at": "2024-01-01T00:00:00+00:00"}
+
+
+def _auth(user):
+    return {"Authorization": f"Bearer {token_verifier.create_token(user)}"}
+
+
+@pytest.fixture
+def client(postgrest):
+    library = postgrest.tables.setdefault("user_library", {})
+    for entry_id in range(1, 6):
+        library[entry_id] = {
+            "id": entry_id,
+            "user_id": ALICE["id"] if entry_id != 3 else BOB["id"],
+            "matched_song_id": entry_id,
+            "created_at": "2024-01-01T00:00:00+00:00",
+        }
+    return TestClient(app)
+
+
+def test_list_is_scoped_to_the_caller(client):
+    response = client.get("/api/library/", headers=_auth(BOB))
+
+    assert response.status_code == 200
+    assert [entry["id"] for entry in response.json()] == [3]
+
+
+def test_list_requires_a_token(client):
+    assert client.get("/api/library/").status_code == 401
+
+
+def test_cursor_round_trip(client):
+    seen = []
+    params = {"limit": 2}
+    while True:
+        response = client.get("/api/library/", params=params, headers=_auth(ALICE))
+        assert response.status_code == 200
+        seen.extend(entry["id"] for entry in response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+        params = {"limit": 2, "cursor": cursor}
+
+    assert seen == [1, 2, 4, 5]
+
+
+def test_invalid_cursor_is_rejected(client):
+    response = client.get("/api/library/", params={"cursor": "not-a-cursor"}, headers=_auth(ALICE))
+    assert response.status_code == 400
+
+
+def test_update_without_user_id_changes_only_the_sent_fields(client, postgrest):
+    response = client.put("/api/library/1", json={"matched_song_id": 9}, headers=_auth(ALICE))
+
+    assert response.status_code == 200
+    assert postgrest.tables["user_library"][1]["matched_song_id"] == 9
+    assert postgrest.tables["user_library"][1]["user_id"] == ALICE["id"]
+
+
+def test_update_of_another_users_entry_is_forbidden(client, postgrest):
+    response = client.put("/api/library/3", json={"matched_song_id": 9}, headers=_auth(ALICE))
+
+    assert response.status_code == 403
+    assert postgrest.tables["user_library"][3]["matched_song_id"] == 3
+
+
+def test_update_cannot_move_an_entry_to_another_user(client, postgrest):
+    response = client.put("/api/library/1", json={"user_id": BOB["id"]}, headers=_auth(ALICE))
+
+    assert response.status_code == 403
+    assert postgrest.tables["user_library"][1]["user_id"] == ALICE["id"]
+
+
+def test_update_of_a_missing_entry_is_not_found(client):
+    response = client.put("/api/library/99", json={"matched_song_id": 9}, headers=_auth(ALICE))
+    assert response.status_code == 404
+
+
+def test_writes_are_filtered_by_owner(client, postgrest):
+    client.put("/api/library/1", json={"matched_song_id": 9}, headers=_auth(ALICE))
+    client.delete("/api/library/2", headers=_auth(ALICE))
+
+    writes = [request for request in postgrest.requests if request.method in ("PATCH", "DELETE")]
+    assert [request.url.params.get("user_id") for request in writes] == ["eq.1", "eq.1"]
+
+
+def test_delete_of_another_users_entry_is_forbidden(client, postgrest):
+    response = client.delete("/api/library/3", headers=_auth(ALICE))
+
+    assert response.status_code == 403
+    assert 3 in postgrest.tables["user_library"]
+
+
+def test_delete_of_own_entry(client, postgrest):
+    response = client.delete("/api/library/2", headers=_auth(ALICE))
+
+    assert response.status_code == 200
+    assert 2 not in postgrest.tables["user_library"]